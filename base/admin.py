@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, ProxyServer, UserSession, ConnectionLog
+from .pagination import EstimatedCountPaginator
+from .user_cache import HEAVY_FIELDS
+from .models import User, ProxyServer, ProxyServerSecrets, SharedBlob, UserSession, ConnectionLog, UsageRollup
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -26,6 +28,16 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
+class ProxyServerSecretsInline(admin.StackedInline):
+    model = ProxyServerSecrets
+    can_delete = False
+    raw_id_fields = ('ca_certificate_blob', 'dh_params_blob')
+    fieldsets = (
+        ('VPN Configuration', {'fields': ('vpn_config',)}),
+        ('WireGuard Keys', {'fields': ('private_key',)}),
+        ('Certificates', {'fields': ('ca_certificate_blob', 'server_certificate', 'server_key', 'dh_params_blob')}),
+    )
+
 @admin.register(ProxyServer)
 class ProxyServerAdmin(admin.ModelAdmin):
     list_display = ('name', 'country', 'city', 'ip_address', 'port', 'vpn_type', 'is_active', 'load_percentage', 'current_users', 'created_at')
@@ -37,18 +49,29 @@ class ProxyServerAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Basic Info', {'fields': ('id', 'name', 'country', 'city', 'ip_address', 'port', 'protocol')}),
-        ('VPN Configuration', {'fields': ('vpn_type', 'vpn_config', 'endpoint', 'encryption', 'handshake')}),
-        ('WireGuard Keys', {'fields': ('public_key', 'private_key')}),
-        ('Certificates', {'fields': ('ca_certificate', 'server_certificate', 'server_key', 'dh_params')}),
+        ('VPN Configuration', {'fields': ('vpn_type', 'endpoint', 'encryption', 'handshake')}),
+        ('WireGuard Keys', {'fields': ('public_key',)}),
         ('Server Status', {'fields': ('is_active', 'load', 'latency', 'max_users', 'current_users')}),
         ('Location Data', {'fields': ('location_data',)}),
         ('Timestamps', {'fields': ('created_at',)}),
     )
+    inlines = [ProxyServerSecretsInline]
     
     def load_percentage(self, obj):
         return f"{obj.load * 100:.1f}%"
     load_percentage.short_description = 'Load'
 
+@admin.register(SharedBlob)
+class SharedBlobAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'size', 'created_at')
+    search_fields = ('digest',)
+    readonly_fields = ('digest', 'content', 'created_at')
+    ordering = ('-created_at',)
+
+    def size(self, obj):
+        return len(obj.content)
+    size.short_description = 'Size'
+
 @admin.register(UserSession)
 class UserSessionAdmin(admin.ModelAdmin):
     list_display = ('user', 'proxy_server', 'original_ip', 'start_time', 'end_time', 'data_used_mb', 'is_active', 'is_routing')
@@ -56,6 +79,8 @@ class UserSessionAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'proxy_server__name', 'original_ip', 'assigned_ip')
     readonly_fields = ('id', 'start_time', 'duration_display')
     ordering = ('-start_time',)
+    list_select_related = ('user', 'proxy_server')
+    raw_id_fields = ('user', 'proxy_server')
     
     fieldsets = (
         ('Session Info', {'fields': ('id', 'user', 'proxy_server', 'original_ip', 'assigned_ip')}),
@@ -63,6 +88,12 @@ class UserSessionAdmin(admin.ModelAdmin):
         ('Status', {'fields': ('is_active', 'is_routing', 'data_used')}),
         ('Technical Details', {'fields': ('vpn_pid', 'interface', 'session_config', 'vpn_config_file')}),
     )
+
+    def get_queryset(self, request):
+        # Users are only shown by name; skip their certificates and keys
+        return super().get_queryset(request).select_related('user', 'proxy_server').defer(
+            *(f'user__{field}' for field in HEAVY_FIELDS)
+        )
     
     def data_used_mb(self, obj):
         return f"{obj.data_used / (1024 * 1024):.2f} MB"
@@ -82,17 +113,27 @@ class UserSessionAdmin(admin.ModelAdmin):
 class ConnectionLogAdmin(admin.ModelAdmin):
     list_display = ('session_user', 'event_type', 'timestamp', 'short_details')
     list_filter = ('event_type', 'timestamp')
-    search_fields = ('session__user__username', 'session__proxy_server__name', 'details')
+    search_fields = ('user__username', 'session__proxy_server__name', 'details')
     readonly_fields = ('id', 'timestamp')
     ordering = ('-timestamp',)
+    raw_id_fields = ('session', 'user')
+    list_select_related = ('user',)
+    # COUNT(*) over the whole log dominates page render; estimate instead
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
-        ('Log Info', {'fields': ('id', 'session', 'event_type', 'timestamp')}),
+        ('Log Info', {'fields': ('id', 'session', 'user', 'event_type', 'timestamp')}),
         ('Details', {'fields': ('details',)}),
     )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').only(
+            'id', 'session_id', 'user_id', 'event_type', 'timestamp', 'details', 'user__username'
+        )
     
     def session_user(self, obj):
-        return obj.session.user.username
+        return obj.user.username
     session_user.short_description = 'User'
     
     def short_details(self, obj):
@@ -100,6 +141,20 @@ class ConnectionLogAdmin(admin.ModelAdmin):
         return details_str[:50] + '...' if len(details_str) > 50 else details_str
     short_details.short_description = 'Details'
 
+@admin.register(UsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'proxy_server', 'hour', 'connect_count', 'error_count', 'data_used_mb', 'session_seconds')
+    list_filter = ('hour', 'proxy_server__country')
+    search_fields = ('user__username', 'proxy_server__name')
+    list_select_related = ('user', 'proxy_server')
+    raw_id_fields = ('user', 'proxy_server')
+    date_hierarchy = 'hour'
+    ordering = ('-hour',)
+
+    def data_used_mb(self, obj):
+        return f"{obj.bytes_used / (1024 * 1024):.2f} MB"
+    data_used_mb.short_description = 'Data Used'
+
 # Optional: Custom admin site header
 admin.site.site_header = "Anonimity VPN Administration"
 admin.site.site_title = "Anonimity VPN Admin"
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from .metrics import request_metrics
+
+
+class ExecutorFull(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Fixed-size thread pool for CPU-heavy work (password hashing) called from
+    async views. At most max_queue calls may be waiting or running; beyond
+    that run() raises ExecutorFull so callers can shed load instead of
+    queueing without limit.
+    """
+
+    def __init__(self, max_workers, max_queue, name='executor'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._started = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorFull(f"{self.max_queue} calls already pending")
+        with self._lock:
+            self._submitted += 1
+        try:
+            future = self._pool.submit(self._call, fn, args)
+        except BaseException:
+            with self._lock:
+                self._submitted -= 1
+            self._slots.release()
+            raise
+        # Freed when the work ends, not when the caller stops waiting: a
+        # cancelled or timed-out request leaves its hashing job running
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def _call(self, fn, args):
+        with self._lock:
+            self._started += 1
+        close_old_connections()
+        try:
+            return fn(*args)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queue_limit': self.max_queue,
+                'queued': self._submitted - self._started,
+                'running': self._started - self._completed,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+# PBKDF2 releases the GIL, so roughly one worker per core is the useful size
+auth_executor = BoundedExecutor(
+    max_workers=getattr(settings, 'AUTH_HASH_WORKERS', 4),
+    max_queue=getattr(settings, 'AUTH_HASH_QUEUE_LIMIT', 256),
+    name='auth-hash',
+)
+
+request_metrics.register_gauge(
+    'auth_executor_tasks',
+    'Login/register hashing calls by state.',
+    lambda: {
+        (('state', state),): auth_executor.stats()[state]
+        for state in ('queued', 'running', 'completed', 'rejected')
+    },
+)
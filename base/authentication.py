@@ -4,9 +4,32 @@ import jwt
 from django.conf import settings
 import datetime
 import json
+from .user_cache import user_cache
 
 User = get_user_model()
 
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class TokenUser:
+    """
+    Stand-in user built from access token claims alone. Views opt in per
+    action with claims_only_actions; it only exposes what the token carries.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, payload):
+        self.id = self.pk = payload['user_id']
+        self.username = payload.get('username', '')
+        self.subscription_tier = payload['subscription_tier']
+
+    def __str__(self):
+        return self.username
+
 class JWTAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
         auth_header = request.headers.get('Authorization')
@@ -22,42 +45,63 @@ class JWTAuthentication(authentication.BaseAuthentication):
         except ValueError:
             return None
 
-        try:
-            # Decode and verify JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            
-            # Check if token is expired
-            if 'exp' in payload:
-                exp_timestamp = payload['exp']
-                current_timestamp = datetime.datetime.now(datetime.timezone.utc).timestamp()
-                if exp_timestamp < current_timestamp:
-                    raise exceptions.AuthenticationFailed('Token has expired')
-            
-            # Get user from token
-            user_id = payload.get('user_id')
-            if not user_id:
-                raise exceptions.AuthenticationFailed('Invalid token')
-            
-            try:
-                user = User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                raise exceptions.AuthenticationFailed('User not found')
-                
-            return (user, token)
-            
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed('Token has expired')
-        except jwt.InvalidTokenError:
+        payload = decode_access_token(token)
+        if self._claims_only(request, payload):
+            return (TokenUser(payload), token)
+        return (get_user_from_payload(payload), token)
+
+    def _claims_only(self, request, payload):
+        """Read-only action whose view accepts a user built from the token"""
+        if request.method not in SAFE_METHODS or 'subscription_tier' not in payload:
+            return False
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        return getattr(view, 'action', None) in getattr(view, 'claims_only_actions', ())
+
+def get_user_from_token(token):
+    """Return the user an access token belongs to or raise AuthenticationFailed"""
+    return get_user_from_payload(decode_access_token(token))
+
+def get_user_from_payload(payload):
+    try:
+        return user_cache.get(payload['user_id'])
+    except User.DoesNotExist:
+        raise exceptions.AuthenticationFailed('User not found')
+
+def decode_access_token(token):
+    """Verified access token claims or raise AuthenticationFailed"""
+    try:
+        # Decode and verify JWT token
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        
+        # Check if token is expired
+        if 'exp' in payload:
+            exp_timestamp = payload['exp']
+            current_timestamp = datetime.datetime.now(datetime.timezone.utc).timestamp()
+            if exp_timestamp < current_timestamp:
+                raise exceptions.AuthenticationFailed('Token has expired')
+        
+        # Get user from token
+        user_id = payload.get('user_id')
+        if not user_id:
             raise exceptions.AuthenticationFailed('Invalid token')
-        except Exception as e:
-            print(f"JWT Authentication error: {e}")
-            raise exceptions.AuthenticationFailed('Authentication failed')
+        return payload
+            
+    except exceptions.AuthenticationFailed:
+        raise
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed('Invalid token')
+    except Exception as e:
+        print(f"JWT Authentication error: {e}")
+        raise exceptions.AuthenticationFailed('Authentication failed')
 
 def create_jwt_token(user):
     """Create JWT token for user"""
     payload = {
         'user_id': str(user.id),  # Ensure user_id is string for UUID
         'username': user.username,
+        'subscription_tier': user.subscription_tier,
         'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1),
         'iat': datetime.datetime.now(datetime.timezone.utc)
     }
@@ -95,4 +139,25 @@ def verify_refresh_token(token):
     except jwt.InvalidTokenError:
         raise exceptions.AuthenticationFailed('Invalid refresh token')
     except User.DoesNotExist:
-        raise exceptions.AuthenticationFailed('User not found')
\ No newline at end of file
+        raise exceptions.AuthenticationFailed('User not found')
+
+class JWTWebSocketMiddleware:
+    """Channels middleware: authenticate WebSockets with ?token=<access token>"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        from urllib.parse import parse_qs
+        from channels.db import database_sync_to_async
+        from django.contrib.auth.models import AnonymousUser
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = (query.get('token') or [None])[0]
+        user = AnonymousUser()
+        if token:
+            try:
+                user = await database_sync_to_async(get_user_from_token)(token)
+            except exceptions.AuthenticationFailed:
+                pass
+        return await self.inner(dict(scope, user=user), receive, send)
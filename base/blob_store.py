@@ -0,0 +1,36 @@
+import hashlib
+from functools import lru_cache
+from django.apps import apps
+from django.conf import settings
+
+
+def blob_digest(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def put_blob(content):
+    """Store content once and return its SharedBlob (None for empty content)"""
+    if not content:
+        return None
+    SharedBlob = apps.get_model('base', 'SharedBlob')
+    blob, _ = SharedBlob.objects.get_or_create(
+        digest=blob_digest(content),
+        defaults={'content': content}
+    )
+    return blob
+
+
+@lru_cache(maxsize=getattr(settings, 'BLOB_CACHE_SIZE', 64))
+def _load_blob(digest):
+    SharedBlob = apps.get_model('base', 'SharedBlob')
+    return SharedBlob.objects.values_list('content', flat=True).get(digest=digest)
+
+
+def get_blob(digest):
+    """
+    Content for a digest. Blobs never change once written, so every
+    caller in this process shares one cached copy.
+    """
+    if not digest:
+        return ''
+    return _load_blob(digest)
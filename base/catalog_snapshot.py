@@ -0,0 +1,87 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from .renderers import FastJSONRenderer
+from .server_index import get_catalog_version, server_index
+
+
+class CatalogSnapshot:
+    """One rendered catalog response, kept as identity and gzip bytes"""
+
+    def __init__(self, data):
+        self.identity = FastJSONRenderer().render(data)
+        self.gzip = gzip.compress(self.identity, compresslevel=6, mtime=0)
+        digest = hashlib.sha256(self.identity).hexdigest()[:32]
+        # Strong validators must differ between encodings of the same body
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+    def response(self, request):
+        use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        etag = self.gzip_etag if use_gzip else self.etag
+
+        client_etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if '*' in client_etags or self.etag in client_etags or self.gzip_etag in client_etags:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(
+                self.gzip if use_gzip else self.identity, content_type='application/json'
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        # Authenticated data: clients and private caches must revalidate
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding', 'Authorization'))
+        return response
+
+
+class CatalogSnapshotCache:
+    """
+    Per-process LRU of snapshots keyed by catalog version, load epoch,
+    host and full path. Saving or deleting a ProxyServer bumps the catalog
+    version, and a server's load crossing a CATALOG_LOAD_STEP boundary
+    moves the load epoch, so stale entries are simply never asked for
+    again and age out. Connects and disconnects inside a bucket keep the
+    snapshot (and its ETag): load and user counts in it lag by at most
+    one step.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def response(self, request, build):
+        """Serve request from the snapshot for its URL, building it with build() on a miss"""
+        key = (
+            get_catalog_version(), server_index.load_epoch(),
+            request.get_host(), request.get_full_path(),
+        )
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+        if snapshot is None:
+            snapshot = CatalogSnapshot(build())
+            with self._lock:
+                self.builds += 1
+                self._entries[key] = snapshot
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot.response(request)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+catalog_snapshots = CatalogSnapshotCache(
+    max_entries=getattr(settings, 'CATALOG_SNAPSHOT_CACHE_SIZE', 64)
+)
@@ -45,6 +45,7 @@ class CloudVPNManager:
     
     def create_openvpn_config(self, server, user):
         """Generate production OpenVPN configuration for cloud"""
+        secrets = server.get_secrets()
         config = f"""# Production OpenVPN Configuration
 # Server: {server.name} - {server.country}
 # Cloud Deployment: Render
@@ -80,7 +81,7 @@ reneg-sec 0
 
 # Server certificates
 <ca>
-{server.ca_certificate}
+{secrets.ca_certificate}
 </ca>
 
 <cert>
@@ -0,0 +1,37 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import UserSession
+from .session_events import session_group, session_status_payload
+
+
+class SessionStatusConsumer(AsyncJsonWebsocketConsumer):
+    """Streams pending -> connecting -> connected/failed transitions for one session"""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.session_id = self.scope['url_route']['kwargs']['session_id']
+        session = await self.get_session(user)
+        if session is None:
+            await self.close(code=4404)
+            return
+
+        self.group_name = session_group(self.session_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        # Current state first, so a client that connects late misses nothing
+        await self.send_json(session_status_payload(session))
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def session_status(self, event):
+        await self.send_json(event['session'])
+
+    @database_sync_to_async
+    def get_session(self, user):
+        return UserSession.objects.filter(id=self.session_id, user=user).first()
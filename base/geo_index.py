@@ -0,0 +1,83 @@
+import heapq
+import math
+
+
+def to_cartesian(latitude, longitude):
+    """Point on the unit sphere; straight-line distance orders like great-circle distance"""
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (
+        math.cos(lat) * math.cos(lon),
+        math.cos(lat) * math.sin(lon),
+        math.sin(lat),
+    )
+
+
+def location_of(location_data):
+    """(latitude, longitude) from a ProxyServer.location_data dict, or None"""
+    try:
+        latitude = float(location_data['latitude'])
+        longitude = float(location_data['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+class KDTree:
+    """
+    Static 3-d tree over servers placed on the unit sphere.
+
+    Built once from (key, (latitude, longitude)) pairs; callers rebuild it
+    when the set of positions changes.
+    """
+
+    def __init__(self, items):
+        points = [(to_cartesian(*position), key) for key, position in items]
+        self._root = self._build(points, 0)
+        self.size = len(points)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        median = len(points) // 2
+        return (
+            points[median][0],
+            points[median][1],
+            axis,
+            self._build(points[:median], depth + 1),
+            self._build(points[median + 1:], depth + 1),
+        )
+
+    def nearest(self, latitude, longitude, k):
+        """Keys of the k closest points, nearest first"""
+        if k <= 0 or self._root is None:
+            return []
+        target = to_cartesian(latitude, longitude)
+        # Max-heap of (-distance², tiebreak, key) holding the best k so far
+        best = []
+        counter = 0
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, plane_distance = stack.pop()
+            if node is None:
+                continue
+            # Skip subtrees whose splitting plane is further than our worst match
+            if len(best) == k and plane_distance >= -best[0][0]:
+                continue
+            point, key, axis, left, right = node
+            distance = sum((p - t) ** 2 for p, t in zip(point, target))
+            counter += 1
+            if len(best) < k:
+                heapq.heappush(best, (-distance, counter, key))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, counter, key))
+
+            delta = target[axis] - point[axis]
+            near, far = (left, right) if delta < 0 else (right, left)
+            stack.append((far, delta * delta))
+            stack.append((near, 0.0))
+        return [key for _, _, key in sorted(best, key=lambda item: (-item[0], item[1]))]
@@ -0,0 +1,59 @@
+import ipaddress
+import threading
+from functools import lru_cache
+from django.conf import settings
+from .geo_index import location_of
+
+try:
+    import maxminddb
+except ImportError:  # GeoIP lookups are optional
+    maxminddb = None
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def _get_reader():
+    global _reader
+    if _reader is None and maxminddb is not None:
+        path = getattr(settings, 'GEOIP_DATABASE', None)
+        if path:
+            with _reader_lock:
+                if _reader is None:
+                    try:
+                        _reader = maxminddb.open_database(str(path))
+                    except (OSError, ValueError) as e:
+                        print(f"GeoIP database unavailable: {e}")
+                        _reader = False
+    return _reader or None
+
+
+def client_prefix(ip):
+    """Network the lookup is cached under: /24 for IPv4, /48 for IPv6"""
+    try:
+        address = ipaddress.ip_address(ip)
+    except (TypeError, ValueError):
+        return None
+    if not address.is_global:
+        return None
+    length = 24 if address.version == 4 else 48
+    return ipaddress.ip_network(f"{address}/{length}", strict=False)
+
+
+@lru_cache(maxsize=getattr(settings, 'GEOIP_CACHE_SIZE', 4096))
+def _locate_prefix(prefix):
+    reader = _get_reader()
+    if reader is None:
+        return None
+    record = reader.get(prefix.network_address)
+    if not record:
+        return None
+    return location_of(record.get('location') or {})
+
+
+def locate(ip):
+    """(latitude, longitude) of a client IP from the local GeoIP database, or None"""
+    prefix = client_prefix(ip)
+    if prefix is None:
+        return None
+    return _locate_prefix(prefix)
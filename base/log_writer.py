@@ -0,0 +1,117 @@
+import atexit
+import threading
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from .models import ConnectionLog
+
+
+class ConnectionLogWriter:
+    """
+    Buffers ConnectionLog rows in memory and writes them with bulk_create.
+
+    log() only appends; a background thread flushes once max_batch events
+    are waiting or flush_interval seconds have passed, and atexit flushes
+    whatever is left when the worker shuts down. With flush_interval=None
+    there is no thread and callers flush themselves.
+    """
+
+    def __init__(self, max_batch=200, flush_interval=2.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        # Keep at most this many unwritten events if the database is down
+        self.max_pending = max_batch * 50
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def log(self, session, event_type, details=None):
+        """Queue one event; timestamped now, not when it is written"""
+        entry = ConnectionLog(
+            session_id=session.id,
+            user_id=session.user_id,
+            event_type=event_type,
+            details=details or {},
+            timestamp=timezone.now(),
+        )
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.max_batch
+            if self._thread is None and self.flush_interval:
+                self._start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                with transaction.atomic():
+                    ConnectionLog.objects.bulk_create(batch, batch_size=self.max_batch)
+            except IntegrityError:
+                # A bad row (e.g. its session was deleted meanwhile) must not
+                # hold back the rest of the batch forever
+                return self._write_each(batch)
+            except Exception as e:
+                print(f"Connection log flush failed ({len(batch)} events): {e}")
+                self._requeue(batch)
+                return 0
+            return len(batch)
+
+    def _write_each(self, batch):
+        written = 0
+        for position, entry in enumerate(batch):
+            try:
+                with transaction.atomic():
+                    ConnectionLog.objects.bulk_create([entry])
+            except IntegrityError as e:
+                print(f"Dropping {entry.event_type} event for session {entry.session_id}: {e}")
+            except Exception as e:
+                print(f"Connection log flush failed ({len(batch) - position} events): {e}")
+                self._requeue(batch[position:])
+                break
+            else:
+                written += 1
+        return written
+
+    def _requeue(self, batch):
+        """Retry next time, oldest first, dropping overflow"""
+        with self._lock:
+            pending = batch + self._buffer
+            if len(pending) > self.max_pending:
+                print(f"Connection log buffer full: dropping {len(pending) - self.max_pending} oldest events")
+            self._buffer = pending[-self.max_pending:]
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _start(self):
+        self._thread = threading.Thread(
+            target=self._run, name='connection-log-writer', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+connection_log_writer = ConnectionLogWriter(
+    max_batch=getattr(settings, 'CONNECTION_LOG_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'CONNECTION_LOG_FLUSH_INTERVAL', 2.0),
+)
+
+
+def log_event(session, event_type, details=None):
+    connection_log_writer.log(session, event_type, details)
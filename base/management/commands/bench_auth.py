@@ -0,0 +1,76 @@
+# management/commands/bench_auth.py
+import statistics
+import time
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from rest_framework.test import APIRequestFactory
+from base.authentication import create_jwt_token
+from base.models import User
+from base.user_cache import user_cache
+from base.views import ProxyServerViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare /api/servers/ latency with per-request user lookups, the user cache and claims-only auth'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--username', help='User to authenticate as (default: first user)')
+
+    def handle(self, *args, **options):
+        user = (
+            User.objects.filter(username=options['username']).first()
+            if options['username'] else User.objects.first()
+        )
+        if user is None:
+            raise CommandError('No user to authenticate as')
+
+        full_token = create_jwt_token(user)
+        # Without subscription_tier the claims-only path cannot be used
+        payload = jwt.decode(full_token, settings.SECRET_KEY, algorithms=['HS256'])
+        payload.pop('subscription_tier')
+        slim_token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+        view = ProxyServerViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        ttl = user_cache.ttl
+
+        self.stdout.write(f"{options['requests']} requests to the server list as {user.username}")
+        self.stdout.write(f"{'mode':<14}{'p50 ms':>9}{'p95 ms':>9}{'queries':>9}")
+        try:
+            for mode, token, cache_ttl in (
+                ('db lookup', slim_token, 0),
+                ('user cache', slim_token, ttl),
+                ('claims only', full_token, ttl),
+            ):
+                user_cache.clear()
+                user_cache.ttl = cache_ttl
+                timings, queries = self.run(view, factory, token, options['requests'])
+                self.stdout.write(
+                    f"{mode:<14}"
+                    f"{statistics.median(timings):>9.3f}"
+                    f"{statistics.quantiles(timings, n=20)[18]:>9.3f}"
+                    f"{queries / len(timings):>9.2f}"
+                )
+        finally:
+            user_cache.ttl = ttl
+            user_cache.clear()
+
+    def run(self, view, factory, token, count):
+        timings = []
+        queries = 0
+        for _ in range(count):
+            request = factory.get('/api/servers/', HTTP_AUTHORIZATION=f'Bearer {token}')
+            reset_queries()
+            connection.force_debug_cursor = True
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - started) * 1000)
+            connection.force_debug_cursor = False
+            queries += len(connection.queries)
+            if response.status_code != 200:
+                raise CommandError(f"Request failed: {response.status_code}")
+        return timings, queries
@@ -0,0 +1,65 @@
+# management/commands/bench_login_executor.py
+import asyncio
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from base.auth_executor import BoundedExecutor
+from base.models import User
+from base.serializers import LoginSerializer
+from base.views import _auth_response
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput and event-loop responsiveness for several auth executor sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=64, help='Concurrent logins per run')
+        parser.add_argument('--sizes', default='1,2,4,8', help='Comma separated executor sizes')
+
+    def handle(self, *args, **options):
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(
+            username=f'bench-login-{uuid.uuid4().hex[:8]}',
+            password=password,
+            mobile_id=f'bench-{uuid.uuid4().hex}',
+        )
+        credentials = {'username': user.username, 'password': password}
+        try:
+            self.stdout.write(f"{options['logins']} concurrent logins per run")
+            self.stdout.write(f"{'workers':>8}{'logins/s':>10}{'p50 ms':>9}{'max ms':>9}{'loop lag ms':>13}")
+            for size in (int(value) for value in options['sizes'].split(',')):
+                rate, p50, worst, lag = asyncio.run(
+                    self.run(size, options['logins'], credentials)
+                )
+                self.stdout.write(f"{size:>8}{rate:>10.1f}{p50:>9.1f}{worst:>9.1f}{lag:>13.2f}")
+        finally:
+            user.delete()
+
+    async def run(self, size, logins, credentials):
+        executor = BoundedExecutor(max_workers=size, max_queue=logins, name='bench-auth')
+        finished = asyncio.Event()
+        lags = []
+
+        async def probe():
+            # Stands in for health/catalog requests sharing the event loop
+            while not finished.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append((time.perf_counter() - started - 0.005) * 1000)
+
+        async def login():
+            started = time.perf_counter()
+            _, response_status = await executor.run(
+                _auth_response, LoginSerializer, credentials, 200
+            )
+            assert response_status == 200
+            return (time.perf_counter() - started) * 1000
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(login() for _ in range(logins))))
+        elapsed = time.perf_counter() - started
+        finished.set()
+        await probe_task
+        executor.shutdown()
+        return logins / elapsed, latencies[len(latencies) // 2], latencies[-1], max(lags or [0])
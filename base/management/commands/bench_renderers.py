@@ -0,0 +1,87 @@
+# management/commands/bench_renderers.py
+import json
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from base.models import ProxyServer, User, UserSession
+from base.renderers import FastJSONRenderer, orjson
+from base.serializers import ProxyServerSerializer, UserSessionSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSONRenderer with FastJSONRenderer on a catalog page and a session history page"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', type=int, default=500)
+        parser.add_argument('--sessions', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson not installed: both renderers use stdlib json'))
+
+        servers = [self.server(i) for i in range(options['servers'])]
+        user = User(id=uuid.uuid4(), username='bench')
+        sessions = [self.session(user, servers[i % len(servers)], i) for i in range(options['sessions'])]
+
+        # Serializer output is what renderers actually receive
+        payloads = (
+            (f"{len(servers)} servers", ProxyServerSerializer(servers, many=True).data),
+            (f"{len(sessions)} sessions", UserSessionSerializer(sessions, many=True).data),
+        )
+
+        self.stdout.write(f"{'payload':<14}{'renderer':<10}{'median ms':>11}{'p95 ms':>9}{'bytes':>9}")
+        for label, data in payloads:
+            outputs = {}
+            for name, renderer in (('stdlib', JSONRenderer()), ('orjson', FastJSONRenderer())):
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    output = renderer.render(data, 'application/json', {})
+                    timings.append((time.perf_counter() - started) * 1000)
+                outputs[name] = output
+                self.stdout.write(
+                    f"{label:<14}{name:<10}{statistics.median(timings):>11.3f}"
+                    f"{statistics.quantiles(timings, n=20)[18]:>9.3f}{len(output):>9}"
+                )
+            if json.loads(outputs['stdlib']) != json.loads(outputs['orjson']):
+                raise CommandError(f"Renderers disagree on the {label} payload")
+
+    def server(self, i):
+        return ProxyServer(
+            id=uuid.uuid4(),
+            name=f'bench-{i}',
+            country='Benchmark',
+            city=f'City {i % 50}',
+            ip_address=f'10.{i // 65025}.{i // 255 % 255}.{i % 255 + 1}',
+            port=51820,
+            protocol='http',
+            vpn_type='wireguard',
+            public_key=uuid.uuid4().hex * 2,
+            load=(i % 100) / 100,
+            latency=10 + i % 200,
+            max_users=1000,
+            current_users=i % 1000,
+            location_data={'latitude': 52.0 + i % 10, 'longitude': 4.0 + i % 10},
+            created_at=timezone.now(),
+        )
+
+    def session(self, user, server, i):
+        start = timezone.now() - timedelta(hours=i)
+        return UserSession(
+            id=uuid.uuid4(),
+            user=user,
+            proxy_server=server,
+            original_ip='203.0.113.7',
+            start_time=start,
+            end_time=start + timedelta(minutes=30),
+            data_used=i * 1024 * 1024,
+            is_active=False,
+            status='ended',
+            session_config={'security_level': 'high', 'kill_switch': True, 'vpn_type': 'wireguard'},
+            interface=f'wg{i:08d}',
+        )
@@ -0,0 +1,72 @@
+# management/commands/bench_server_selection.py
+import random
+import statistics
+from django.core.management.base import BaseCommand
+from base.models import ProxyServer
+from base.server_index import MAX_OPTIMAL_LOAD
+from base.server_selection import SELECTION_MODES, select_server
+
+
+class Command(BaseCommand):
+    help = 'Simulate a burst of concurrent connects against a seeded catalog for each selection mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connects', type=int, default=1000)
+        parser.add_argument('--servers', type=int, default=20)
+        parser.add_argument('--candidates', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        catalog = self.build_catalog(options['servers'], options['seed'])
+
+        # Every connect in the burst sees the same loads, exactly like
+        # concurrent requests that arrive before any update_load() lands
+        ranked = sorted(catalog, key=lambda s: (s.load, s.latency))
+        candidates = [s for s in ranked if s.load < MAX_OPTIMAL_LOAD][:options['candidates']]
+
+        self.stdout.write(
+            f"{options['connects']} connects, {len(catalog)} servers, "
+            f"{len(candidates)} candidates, seed {options['seed']}"
+        )
+        self.stdout.write(f"{'mode':<14}{'used':>6}{'max share':>11}{'stdev':>9}{'peak load':>11}{'overfull':>10}")
+
+        for mode in SELECTION_MODES:
+            rng = random.Random(options['seed'])
+            assigned = {server.id: 0 for server in catalog}
+            for _ in range(options['connects']):
+                server = select_server(candidates, mode, rng=rng)
+                assigned[server.id] += 1
+
+            counts = [assigned[server.id] for server in candidates]
+            loads = [
+                (server.current_users + assigned[server.id]) / server.max_users
+                for server in catalog
+            ]
+            self.stdout.write(
+                f"{mode:<14}"
+                f"{sum(1 for c in counts if c):>6}"
+                f"{max(counts) / options['connects']:>10.1%}"
+                f"{statistics.pstdev(counts):>9.1f}"
+                f"{max(loads):>10.1%}"
+                f"{sum(1 for load in loads if load > 1.0):>10}"
+            )
+
+    def build_catalog(self, count, seed):
+        """Unsaved servers with reproducible load and capacity"""
+        rng = random.Random(seed)
+        catalog = []
+        for i in range(count):
+            max_users = rng.choice([100, 250, 500, 1000])
+            current_users = int(max_users * rng.uniform(0.05, 0.9))
+            catalog.append(ProxyServer(
+                name=f'bench-{i}',
+                country='Benchmark',
+                ip_address=f'10.0.{i // 250}.{i % 250 + 1}',
+                port=1194,
+                protocol='http',
+                max_users=max_users,
+                current_users=current_users,
+                load=min(current_users / max_users, 1.0),
+                latency=rng.randint(10, 200),
+            ))
+        return catalog
@@ -0,0 +1,94 @@
+# management/commands/bench_session_throughput.py
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from base.log_writer import connection_log_writer
+from base.models import ProxyServer, User
+from base.proxy_manager import ProxyManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure connect/disconnect throughput (session bookkeeping only, no tunnels) "
+        "against the configured database. Run once with DATABASE_URL unset (SQLite) "
+        "and once pointing at Postgres to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--cycles', type=int, default=20, help='Connect/disconnect cycles per worker')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        cycles = options['cycles']
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            f"{connection.vendor} ({settings_dict['NAME']}), CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}, "
+            f"{workers} workers x {cycles} cycles"
+        )
+
+        tag = uuid.uuid4().hex[:8]
+        server = ProxyServer.objects.create(
+            name=f'bench-{tag}',
+            country='Bench',
+            ip_address='10.255.255.2',
+            port=1194,
+            protocol='http',
+            # Never in the catalog: automatic selection must not send real users here
+            is_active=False,
+            max_users=workers * 2,
+        )
+        users = [
+            User.objects.create(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.invalid')
+            for i in range(workers)
+        ]
+        try:
+            manager = ProxyManager()
+            latencies = []
+            errors = []
+            lock = threading.Lock()
+            start = threading.Barrier(workers)
+
+            def worker(user):
+                timings = []
+                try:
+                    start.wait()
+                    for _ in range(cycles):
+                        began = time.perf_counter()
+                        session = manager.create_session(
+                            user, server_id=server.id, client_ip='192.0.2.1', include_inactive=True
+                        )
+                        manager.end_session(session)
+                        timings.append(time.perf_counter() - began)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                finally:
+                    connection.close()
+                with lock:
+                    latencies.extend(timings)
+
+            began = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(worker, users))
+            elapsed = time.perf_counter() - began
+            connection_log_writer.flush()
+
+            if errors:
+                self.stdout.write(self.style.ERROR(f"{len(errors)} workers failed, first: {errors[0]}"))
+            if not latencies:
+                return
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f"{len(latencies)} cycles in {elapsed:.2f}s: {len(latencies) / elapsed:.1f} cycles/s, "
+                f"median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+            )
+        finally:
+            # Only the bench users' rows (deleting the users cascades to them)
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+            server.delete()
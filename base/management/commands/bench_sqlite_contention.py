@@ -0,0 +1,137 @@
+# management/commands/bench_sqlite_contention.py
+import statistics
+import threading
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from base.log_writer import connection_log_writer
+from base.models import ProxyServer, User, UserSession
+from base.proxy_manager import ProxyManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Run catalog/history readers alongside a session writer on SQLite and report "
+        "reader latency, writer throughput and lock errors. --baseline uses the "
+        "default rollback journal without the SQLITE_TUNING pragmas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--baseline', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"SQLite only (configured: {connection.vendor})")
+
+        if options['baseline']:
+            with override_settings(SQLITE_TUNING=False):
+                self.set_journal_mode('DELETE')
+                self.run(options)
+        else:
+            with override_settings(SQLITE_TUNING=True):
+                # New connections, so the connection_created hook tunes them
+                connection.close()
+                self.run(options)
+
+    def set_journal_mode(self, mode):
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode = {mode}')
+
+    def run(self, options):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+        self.stdout.write(
+            f"journal_mode={journal_mode} synchronous={synchronous}, "
+            f"{options['readers']} readers + 1 writer for {options['seconds']:.0f}s"
+        )
+
+        tag = uuid.uuid4().hex[:8]
+        server = ProxyServer.objects.create(
+            name=f'bench-{tag}',
+            country='Bench',
+            ip_address='10.255.255.3',
+            port=1194,
+            protocol='http',
+            # Never in the catalog: automatic selection must not send real users here
+            is_active=False,
+            max_users=10,
+        )
+        user = User.objects.create(username=f'bench-{tag}', email=f'bench-{tag}@example.invalid')
+        stop = threading.Event()
+        lock = threading.Lock()
+        read_latencies = []
+        write_latencies = []
+        errors = []
+
+        def reader():
+            timings = []
+            try:
+                while not stop.is_set():
+                    began = time.perf_counter()
+                    try:
+                        list(ProxyServer.objects.filter(is_active=True).order_by('load')[:50])
+                        list(UserSession.objects.filter(user=user).order_by('-start_time', '-id')[:20])
+                    except OperationalError as e:
+                        with lock:
+                            errors.append(f"reader: {e}")
+                        continue
+                    timings.append(time.perf_counter() - began)
+            finally:
+                connection.close()
+            with lock:
+                read_latencies.extend(timings)
+
+        def writer():
+            manager = ProxyManager()
+            try:
+                while not stop.is_set():
+                    began = time.perf_counter()
+                    try:
+                        session = manager.create_session(
+                            user, server_id=server.id, client_ip='192.0.2.1', include_inactive=True
+                        )
+                        manager.end_session(session)
+                        connection_log_writer.flush()
+                    except OperationalError as e:
+                        with lock:
+                            errors.append(f"writer: {e}")
+                        continue
+                    write_latencies.append(time.perf_counter() - began)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads.append(threading.Thread(target=writer))
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(options['seconds'])
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            seconds = options['seconds']
+            for label, latencies in (('reads', read_latencies), ('writes', write_latencies)):
+                if not latencies:
+                    self.stdout.write(f"{label:<7}none completed")
+                    continue
+                latencies.sort()
+                p95 = latencies[int(len(latencies) * 0.95) - 1]
+                self.stdout.write(
+                    f"{label:<7}{len(latencies) / seconds:8.1f}/s  median {statistics.median(latencies) * 1000:6.2f} ms"
+                    f"  p95 {p95 * 1000:7.2f} ms  max {latencies[-1] * 1000:7.2f} ms"
+                )
+            if errors:
+                self.stdout.write(self.style.ERROR(f"{len(errors)} lock errors, first: {errors[0]}"))
+        finally:
+            # Only the bench user's rows (deleting the user cascades to them)
+            user.delete()
+            server.delete()
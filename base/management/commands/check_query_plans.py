@@ -0,0 +1,34 @@
+# management/commands/check_query_plans.py
+from django.core.management.base import BaseCommand, CommandError
+from base.models import User, UserSession
+from base.query_plans import explain, hot_queries, uses_index
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot session/log queries against this database and fail if any "
+        "of them is not planned on its index (base.tests.QueryPlanTests checks the same)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan in full')
+
+    def handle(self, *args, **options):
+        user = User.objects.only('id').first()
+        session = UserSession.objects.only('id').first()
+        if user is None or session is None:
+            raise CommandError("Needs at least one user and one session (run seed_data first)")
+
+        failures = []
+        for label, queryset, index_name in hot_queries(user, session):
+            plan = explain(queryset)
+            ok = uses_index(plan, index_name)
+            status = self.style.SUCCESS(index_name) if ok else self.style.ERROR(f'not using {index_name}')
+            self.stdout.write(f"{label:<18}{status}")
+            if options['verbose_plans'] or not ok:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+            if not ok:
+                failures.append(label)
+
+        if failures:
+            raise CommandError(f"Not using their index: {', '.join(failures)}")
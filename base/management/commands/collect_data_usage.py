@@ -0,0 +1,34 @@
+# management/commands/collect_data_usage.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from base.usage_collector import UsageCollector
+
+
+class Command(BaseCommand):
+    help = 'Record tunnel traffic into session and user data usage, once or periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            default=getattr(settings, 'USAGE_COLLECT_INTERVAL', 30),
+            help='Seconds between passes'
+        )
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+
+    def handle(self, *args, **options):
+        collector = UsageCollector()
+        while True:
+            close_old_connections()
+            started = time.monotonic()
+            try:
+                recorded = collector.collect()
+                self.stdout.write(
+                    f"📊 Recorded {recorded} bytes in {(time.monotonic() - started) * 1000:.1f} ms"
+                )
+            except Exception as e:
+                self.stderr.write(f"Usage collection failed: {e}")
+            if options['once']:
+                return
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
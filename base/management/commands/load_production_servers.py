@@ -2,7 +2,7 @@
 import json
 import os
 from django.core.management.base import BaseCommand
-from base.models import ProxyServer
+from base.models import ProxyServer, ProxyServerSecrets
 import uuid
 
 class Command(BaseCommand):
@@ -31,10 +31,15 @@ class Command(BaseCommand):
         for server_data in production_servers:
             try:
                 server_id = server_data.pop('id')
+                secrets = server_data.pop('secrets')
                 server, created = ProxyServer.objects.update_or_create(
                     id=server_id,
                     defaults=server_data
                 )
+                ProxyServerSecrets.objects.update_or_create(
+                    server=server,
+                    defaults=secrets
+                )
                 
                 status = "✅ ADDED" if created else "↻ UPDATED"
                 self.stdout.write(
@@ -86,14 +91,14 @@ class Command(BaseCommand):
                 'handshake': 'RSA-4096',
                 'endpoint': server_info['domain'],
                 
-                # Certificate fields that EXIST in your model
-                'ca_certificate': production_data['ca_certificate'],
-                'server_certificate': cert_info['server_crt'],  # REAL certificate
-                'server_key': cert_info['server_key'],  # REAL private key
-                'dh_params': production_data['dh_params'],
-                
-                # VPN config
-                'vpn_config': server_data['openvpn_config'],
+                # Certificates and config are stored in ProxyServerSecrets
+                'secrets': {
+                    'ca_certificate': production_data['ca_certificate'],
+                    'server_certificate': cert_info['server_crt'],  # REAL certificate
+                    'server_key': cert_info['server_key'],  # REAL private key
+                    'dh_params': production_data['dh_params'],
+                    'vpn_config': server_data['openvpn_config'],
+                },
                 
                 # REMOVED: 'provider', 'tls_auth' - these don't exist in your model
                 # REMOVED: 'tls_version', 'data_cipher', 'auth_digest'
@@ -0,0 +1,37 @@
+# management/commands/rollup_usage.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from base.usage_rollup import prune_connection_logs, rollup_usage
+
+
+class Command(BaseCommand):
+    help = 'Compact new ConnectionLog rows into hourly usage rollups and prune old raw rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-prune', action='store_true', help='Only roll up, keep raw rows')
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=getattr(settings, 'CONNECTION_LOG_RETENTION_DAYS', 30)
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Stop pruning after this many batches (the rest waits for the next run)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows, touched = rollup_usage()
+        self.stdout.write(f"📦 Rolled up {rows} log rows into {touched} hourly rollups")
+
+        if not options['no_prune']:
+            deleted = prune_connection_logs(
+                retention_days=options['retention_days'],
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+            )
+            self.stdout.write(
+                f"🧹 Pruned {deleted} log rows older than {options['retention_days']} days"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.monotonic() - started:.2f}s"))
@@ -0,0 +1,35 @@
+# management/commands/run_vpn_supervisor.py
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from base.vpn_supervisor import DEFAULT_SOCKET, VPNSupervisor
+
+
+class Command(BaseCommand):
+    help = 'Run the per-host supervisor that owns all WireGuard/OpenVPN processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=getattr(settings, 'VPN_SUPERVISOR_SOCKET', None) or DEFAULT_SOCKET,
+            help='Unix socket the Django workers connect to'
+        )
+
+    def handle(self, *args, **options):
+        supervisor = VPNSupervisor(options['socket'])
+
+        def stop(signum, frame):
+            # shutdown() blocks until serve_forever() returns, so not from this thread
+            threading.Thread(target=supervisor.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(self.style.SUCCESS(f"🛡️  VPN supervisor listening on {options['socket']}"))
+        try:
+            supervisor.serve_forever()
+        finally:
+            self.stdout.write("Stopping all VPN connections...")
+            supervisor.stop_all()
+            supervisor.server_close()
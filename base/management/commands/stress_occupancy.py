@@ -0,0 +1,84 @@
+# management/commands/stress_occupancy.py
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from base.models import ProxyServer
+
+
+class Command(BaseCommand):
+    help = 'Hammer one server with parallel connect/disconnect cycles and verify the occupancy counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=200)
+        parser.add_argument('--cycles', type=int, default=5)
+        parser.add_argument(
+            '--legacy', action='store_true',
+            help='Use the old read-modify-write update to show the drift it causes'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        cycles = options['cycles']
+        change = self.legacy_change if options['legacy'] else ProxyServer.change_occupancy
+
+        server = ProxyServer.objects.create(
+            name=f'stress-{uuid.uuid4().hex[:8]}',
+            country='Stress Test',
+            ip_address='10.255.255.1',
+            port=1194,
+            protocol='http',
+            is_active=False,
+            max_users=workers * 2,
+        )
+        try:
+            observed = []
+
+            def check_connected():
+                # Runs once, in the last thread to reach the barrier
+                observed.append(ProxyServer.objects.get(id=server.id).current_users)
+
+            start = threading.Barrier(workers)
+            connected = threading.Barrier(workers, action=check_connected)
+            churned = threading.Barrier(workers, action=check_connected)
+
+            def worker():
+                try:
+                    start.wait()
+                    change(server.id, 1)
+                    connected.wait()
+                    for _ in range(cycles):
+                        change(server.id, -1)
+                        change(server.id, 1)
+                    churned.wait()
+                    change(server.id, -1)
+                finally:
+                    connection.close()
+
+            # Everyone connects, churns, then disconnects
+            self.stdout.write(f"{workers} workers x {cycles} connect/disconnect cycles")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(worker) for _ in range(workers)]
+                for future in futures:
+                    future.result()
+
+            server.refresh_from_db()
+            self.stdout.write(
+                f"after connect={observed[0]} after churn={observed[1]} "
+                f"final={server.current_users} load={server.load:.4f}"
+            )
+            if observed != [workers, workers] or server.current_users != 0 or server.load != 0.0:
+                raise CommandError(
+                    f"Counters drifted: expected {workers}, {workers}, 0 users"
+                )
+            self.stdout.write(self.style.SUCCESS('Counters exact'))
+        finally:
+            server.delete()
+
+    @staticmethod
+    def legacy_change(server_id, delta):
+        server = ProxyServer.objects.get(id=server_id)
+        server.current_users = max(0, server.current_users + delta)
+        server.load = min(server.current_users / server.max_users, 1.0)
+        server.save()
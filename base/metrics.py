@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+# Upper bounds in seconds, Prometheus' usual latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class RequestMetrics:
+    """
+    Process-local request counters: a fixed-bucket latency histogram per
+    (route, method) and a response counter per (route, method, status).
+    Recording is one bisect and a few integer adds under a lock.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._latency = {}    # (route, method) -> [bucket counts..., +Inf count, sum]
+        self._responses = {}  # (route, method, status) -> count
+        self._gauges = []     # (name, help, callable returning {labels tuple: value})
+
+    def observe(self, route, method, status, seconds):
+        key = (route, method)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._latency.get(key)
+            if series is None:
+                series = self._latency[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+            status_key = (route, method, status)
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+
+    def register_gauge(self, name, help_text, collect):
+        """collect() returns {((label, value), ...): number} at scrape time"""
+        self._gauges.append((name, help_text, collect))
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._responses.clear()
+
+    def render(self):
+        """Everything in Prometheus text exposition format"""
+        with self._lock:
+            latency = {key: list(series) for key, series in self._latency.items()}
+            responses = dict(self._responses)
+
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by route.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (route, method), series in sorted(latency.items()):
+            labels = _labels(route=route, method=method)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series[-1]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+        lines += [
+            '# HELP http_responses_total Responses by route and status code.',
+            '# TYPE http_responses_total counter',
+        ]
+        for (route, method, status), count in sorted(responses.items()):
+            lines.append(
+                f'http_responses_total{{{_labels(route=route, method=method, status=status)}}} {count}'
+            )
+
+        for name, help_text, collect in self._gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Metrics gauge {name} failed: {e}")
+                continue
+            for labels, value in sorted(values.items()):
+                label_text = _labels(**dict(labels))
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
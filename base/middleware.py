@@ -1,25 +1,123 @@
-class DebugMiddleware:
+import json
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .metrics import request_metrics
+from .query_inspector import DEFAULT_REPEAT_THRESHOLD, record_queries
+
+REDACTED = '[redacted]'
+SENSITIVE_HEADERS = {'authorization', 'cookie', 'x-csrftoken'}
+SENSITIVE_FIELDS = {'password', 'password2', 'access', 'refresh', 'token', 'private_key'}
+MAX_DUMP_BODY = 2048
+
+
+def route_of(request):
+    """Low-cardinality label: the URL name, never the raw path"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+class TimingMiddleware:
+    """
+    Records per-route latency and status counts into request_metrics and
+    prints a redacted dump of a REQUEST_DUMP_SAMPLE_RATE fraction of
+    requests. Works in both sync and async middleware chains.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_DUMP_SAMPLE_RATE', 0.0)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Print request details for debugging
-        print(f"=== REQUEST ===")
-        print(f"Path: {request.path}")
-        print(f"Method: {request.method}")
-        print(f"Headers: {dict(request.headers)}")
-        if request.body:
-            try:
-                print(f"Body: {request.body.decode('utf-8')}")
-            except:
-                print(f"Body: [binary data]")
-        
+        if self.async_mode:
+            return self.__acall__(request)
+        sampled = self._sampled(request)
+        started = time.perf_counter()
         response = self.get_response(request)
-        
-        print(f"=== RESPONSE ===")
-        print(f"Status: {response.status_code}")
-        print(f"Headers: {dict(response.headers)}")
-        if hasattr(response, 'data'):
-            print(f"Data: {response.data}")
-        
-        return response
\ No newline at end of file
+        self._record(request, response, time.perf_counter() - started, sampled)
+        return response
+
+    async def __acall__(self, request):
+        sampled = self._sampled(request)
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, sampled)
+        return response
+
+    def _sampled(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return False
+        # Read now; once the view consumes the stream the body is gone
+        try:
+            request.body
+        except Exception:
+            pass
+        return True
+
+    def _record(self, request, response, elapsed, sampled):
+        request_metrics.observe(route_of(request), request.method, response.status_code, elapsed)
+        if sampled:
+            self._dump(request, response, elapsed)
+
+    def _dump(self, request, response, elapsed):
+        headers = {
+            name: REDACTED if name.lower() in SENSITIVE_HEADERS else value
+            for name, value in request.headers.items()
+        }
+        print(f"=== SAMPLED REQUEST {request.method} {request.path} ===")
+        print(f"Route: {route_of(request)} Status: {response.status_code} Time: {elapsed * 1000:.1f} ms")
+        print(f"Headers: {headers}")
+        body = self._redacted_body(request)
+        if body:
+            print(f"Body: {body}")
+
+    def _redacted_body(self, request):
+        raw = getattr(request, '_body', b'')
+        if not raw:
+            return ''
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return f"[{len(raw)} bytes, not JSON]"
+        if isinstance(data, dict):
+            data = {
+                key: REDACTED if key.lower() in SENSITIVE_FIELDS else value
+                for key, value in data.items()
+            }
+        return json.dumps(data)[:MAX_DUMP_BODY]
+
+
+class QueryCountMiddleware:
+    """
+    Opt-in (QUERY_INSPECTION) per-request SQL accounting: query count, DB
+    time and repeated query shapes, printed with a stack sample when a
+    request looks like N+1. With DEBUG on the numbers are also returned as
+    X-DB-* response headers. Sync only; it is a development tool.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+
+    def __call__(self, request):
+        with record_queries(self.repeat_threshold) as recorder:
+            response = self.get_response(request)
+
+        if recorder.repeated():
+            print(f"⚠️  Possible N+1 in {request.method} {request.path}: {recorder.report()}")
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f"{recorder.duration * 1000:.1f}"
+            response['X-DB-Repeated-Queries'] = str(sum(times for _, times in recorder.repeated()))
+        return response
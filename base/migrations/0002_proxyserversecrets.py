@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SECRET_FIELDS = (
+    'vpn_config', 'private_key', 'ca_certificate',
+    'server_certificate', 'server_key', 'dh_params',
+)
+
+
+def copy_secrets(apps, schema_editor):
+    ProxyServer = apps.get_model('base', 'ProxyServer')
+    ProxyServerSecrets = apps.get_model('base', 'ProxyServerSecrets')
+    secrets = [
+        ProxyServerSecrets(server_id=row['id'], **{f: row[f] for f in SECRET_FIELDS})
+        for row in ProxyServer.objects.values('id', *SECRET_FIELDS).iterator()
+        if any(row[f] for f in SECRET_FIELDS)
+    ]
+    ProxyServerSecrets.objects.bulk_create(secrets, batch_size=500)
+
+
+def restore_secrets(apps, schema_editor):
+    ProxyServer = apps.get_model('base', 'ProxyServer')
+    ProxyServerSecrets = apps.get_model('base', 'ProxyServerSecrets')
+    for row in ProxyServerSecrets.objects.values('server_id', *SECRET_FIELDS).iterator():
+        ProxyServer.objects.filter(id=row.pop('server_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyServerSecrets',
+            fields=[
+                ('server', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='secrets', serialize=False, to='base.proxyserver')),
+                ('vpn_config', models.TextField(blank=True)),
+                ('private_key', models.TextField(blank=True)),
+                ('ca_certificate', models.TextField(blank=True)),
+                ('server_certificate', models.TextField(blank=True)),
+                ('server_key', models.TextField(blank=True)),
+                ('dh_params', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'proxy server secrets',
+            },
+        ),
+        migrations.RunPython(copy_secrets, restore_secrets),
+        migrations.RemoveField(
+            model_name='proxyserver',
+            name='ca_certificate',
+        ),
+        migrations.RemoveField(
+            model_name='proxyserver',
+            name='dh_params',
+        ),
+        migrations.RemoveField(
+            model_name='proxyserver',
+            name='private_key',
+        ),
+        migrations.RemoveField(
+            model_name='proxyserver',
+            name='server_certificate',
+        ),
+        migrations.RemoveField(
+            model_name='proxyserver',
+            name='server_key',
+        ),
+        migrations.RemoveField(
+            model_name='proxyserver',
+            name='vpn_config',
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:47
+
+import hashlib
+from django.db import migrations, models
+import django.db.models.deletion
+
+SHARED_FIELDS = ('ca_certificate', 'dh_params')
+
+
+def move_to_blobs(apps, schema_editor):
+    SharedBlob = apps.get_model('base', 'SharedBlob')
+    ProxyServerSecrets = apps.get_model('base', 'ProxyServerSecrets')
+    known = set(SharedBlob.objects.values_list('digest', flat=True))
+    for secrets in ProxyServerSecrets.objects.only('server_id', *SHARED_FIELDS).iterator():
+        updates = {}
+        for field in SHARED_FIELDS:
+            content = getattr(secrets, field)
+            if not content:
+                continue
+            digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            if digest not in known:
+                SharedBlob.objects.create(digest=digest, content=content)
+                known.add(digest)
+            updates[f'{field}_blob_id'] = digest
+        if updates:
+            ProxyServerSecrets.objects.filter(server_id=secrets.server_id).update(**updates)
+
+
+def restore_from_blobs(apps, schema_editor):
+    SharedBlob = apps.get_model('base', 'SharedBlob')
+    ProxyServerSecrets = apps.get_model('base', 'ProxyServerSecrets')
+    contents = dict(SharedBlob.objects.values_list('digest', 'content'))
+    for row in ProxyServerSecrets.objects.values(
+        'server_id', *(f'{field}_blob_id' for field in SHARED_FIELDS)
+    ).iterator():
+        ProxyServerSecrets.objects.filter(server_id=row['server_id']).update(**{
+            field: contents.get(row[f'{field}_blob_id'], '') for field in SHARED_FIELDS
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0002_proxyserversecrets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharedBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='proxyserversecrets',
+            name='ca_certificate_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='base.sharedblob'),
+        ),
+        migrations.AddField(
+            model_name='proxyserversecrets',
+            name='dh_params_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='base.sharedblob'),
+        ),
+        migrations.RunPython(move_to_blobs, restore_from_blobs),
+        migrations.RemoveField(
+            model_name='proxyserversecrets',
+            name='ca_certificate',
+        ),
+        migrations.RemoveField(
+            model_name='proxyserversecrets',
+            name='dh_params',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+def backfill_status(apps, schema_editor):
+    # Sessions created before this change were only saved once the tunnel was up
+    UserSession = apps.get_model('base', 'UserSession')
+    UserSession.objects.filter(is_active=True).update(status='connected')
+    UserSession.objects.filter(is_active=False).update(status='ended')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0003_sharedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='failure_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('connecting', 'Connecting'), ('connected', 'Connected'), ('failed', 'Failed'), ('ended', 'Ended')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
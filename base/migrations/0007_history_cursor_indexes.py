@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0006_usagerollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='connectionlog',
+            index=models.Index(fields=['session', '-timestamp', '-id'], name='connlog_session_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['user', '-start_time', '-id'], name='session_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:07
+
+from collections import Counter
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def end_duplicate_sessions(apps, schema_editor):
+    """Keep each user's newest active session; end the rest and free their slots"""
+    UserSession = apps.get_model('base', 'UserSession')
+    ProxyServer = apps.get_model('base', 'ProxyServer')
+
+    users = (
+        UserSession.objects.filter(is_active=True)
+        .values('user_id').annotate(active=Count('id')).filter(active__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    released = Counter()
+    now = timezone.now()
+    for user_id in users:
+        stale = list(
+            UserSession.objects.filter(user_id=user_id, is_active=True)
+            .order_by('-start_time', '-id')
+            .values_list('id', 'proxy_server_id')[1:]
+        )
+        UserSession.objects.filter(id__in=[session_id for session_id, _ in stale]).update(
+            is_active=False, end_time=now, status='ended'
+        )
+        released.update(server_id for _, server_id in stale)
+
+    for server in ProxyServer.objects.filter(id__in=released):
+        server.current_users = max(server.current_users - released[server.id], 0)
+        server.load = min(server.current_users / max(server.max_users, 1), 1.0)
+        server.save(update_fields=['current_users', 'load'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_history_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(end_duplicate_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usersession',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('user',), name='one_active_session_per_user'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+COUNTERS = ('connect_count', 'error_count', 'bytes_used', 'session_seconds')
+
+
+def merge_deleted_server_rollups(apps, schema_editor):
+    """Fold rollups of deleted servers into one row per user and hour"""
+    UsageRollup = apps.get_model('base', 'UsageRollup')
+
+    duplicates = (
+        UsageRollup.objects.filter(proxy_server__isnull=True)
+        .values('user_id', 'hour').annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for group in duplicates:
+        keep, *rest = UsageRollup.objects.filter(
+            proxy_server__isnull=True, user_id=group['user_id'], hour=group['hour']
+        ).order_by('id')
+        for rollup in rest:
+            for field in COUNTERS:
+                setattr(keep, field, getattr(keep, field) + getattr(rollup, field))
+        keep.save(update_fields=COUNTERS)
+        UsageRollup.objects.filter(id__in=[rollup.id for rollup in rest]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_shared_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_deleted_server_rollups, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='usagerollup',
+            name='unique_usage_rollup',
+        ),
+        migrations.AddConstraint(
+            model_name='usagerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('proxy_server__isnull', False)), fields=('user', 'proxy_server', 'hour'), name='unique_usage_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='usagerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('proxy_server__isnull', True)), fields=('user', 'hour'), name='unique_usage_rollup_no_server'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_session_users(apps, schema_editor):
+    """One UPDATE: every existing row takes its session's user"""
+    ConnectionLog = apps.get_model('base', 'ConnectionLog')
+    UserSession = apps.get_model('base', 'UserSession')
+    ConnectionLog.objects.update(
+        user_id=Subquery(UserSession.objects.filter(id=OuterRef('session_id')).values('user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_usage_rollup_null_server'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connectionlog',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='connection_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_session_users, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='connectionlog',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='connection_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='connectionlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='connlog_user_time_idx'),
+        ),
+    ]
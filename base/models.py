@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Greatest, Least
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 import uuid
+from . import blob_store
 
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -62,24 +66,25 @@ class ProxyServer(models.Model):
     current_users = models.IntegerField(default=0)
     location_data = models.JSONField(default=dict)  # GPS coordinates, etc.
     created_at = models.DateTimeField(auto_now_add=True)
-    vpn_config = models.TextField(blank=True)  # OpenVPN/WireGuard config
     vpn_type = models.CharField(
         max_length=20,
         choices=[('openvpn', 'OpenVPN'), ('wireguard', 'WireGuard'), ('socks5', 'SOCKS5')],
         default='openvpn'
     )
     public_key = models.TextField(blank=True)  # For WireGuard
-    private_key = models.TextField(blank=True)  # For WireGuard (encrypted)
     endpoint = models.CharField(max_length=255, blank=True)  # Server endpoint
     
     # Encryption settings
     encryption = models.CharField(max_length=50, default='AES-256-GCM')
     handshake = models.CharField(max_length=50, default='RSA-2048')
 
-    ca_certificate = models.TextField(blank=True)
-    server_certificate = models.TextField(blank=True)
-    server_key = models.TextField(blank=True)
-    dh_params = models.TextField(blank=True)
+    # Crypto material lives in ProxyServerSecrets so this row stays small
+    CATALOG_FIELDS = (
+        'id', 'name', 'country', 'city', 'ip_address', 'port', 'protocol',
+        'is_active', 'load', 'latency', 'max_users', 'current_users',
+        'location_data', 'created_at', 'vpn_type', 'public_key', 'endpoint',
+        'encryption', 'handshake',
+    )
 
     class Meta:
         indexes = [
@@ -89,12 +94,93 @@ class ProxyServer(models.Model):
 
     def update_load(self):
         self.load = min(self.current_users / self.max_users, 1.0)
-        self.save()
+        self.save(update_fields=['load'])
+
+    @staticmethod
+    def change_occupancy(server_id, delta):
+        """
+        Add delta to current_users and recompute load in a single UPDATE,
+        so concurrent connects and disconnects never lose a change. Returns
+        False (and changes nothing) if the server is gone or an increase
+        would take it past max_users.
+        """
+        users = Greatest(F('current_users') + delta, 0)
+        queryset = ProxyServer.objects.filter(id=server_id)
+        if delta > 0:
+            queryset = queryset.filter(current_users__lte=F('max_users') - delta)
+        updated = queryset.update(
+            current_users=users,
+            load=Least(Cast(users, FloatField()) / Greatest(F('max_users'), 1), Value(1.0)),
+        )
+        if updated:
+            from .server_index import server_index
+            server_index.occupancy_changed(server_id, delta)
+        return bool(updated)
+
+    def get_secrets(self):
+        """Crypto material for this server (empty and unsaved if none exists yet)"""
+        try:
+            return self.secrets
+        except ProxyServerSecrets.DoesNotExist:
+            return ProxyServerSecrets(server=self)
 
     def __str__(self):
         return f"{self.name} ({self.country}) - {self.load*100:.1f}%"
 
 
+class SharedBlob(models.Model):
+    """Immutable content shared by many servers, addressed by its SHA-256"""
+    digest = models.CharField(max_length=64, primary_key=True)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({len(self.content)} chars)"
+
+
+class ProxyServerSecrets(models.Model):
+    server = models.OneToOneField(
+        ProxyServer, on_delete=models.CASCADE, primary_key=True, related_name='secrets'
+    )
+    vpn_config = models.TextField(blank=True)  # OpenVPN/WireGuard config
+    private_key = models.TextField(blank=True)  # For WireGuard (encrypted)
+    server_certificate = models.TextField(blank=True)
+    server_key = models.TextField(blank=True)
+
+    # Identical for every server signed by the same CA, so stored once
+    ca_certificate_blob = models.ForeignKey(
+        SharedBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+'
+    )
+    dh_params_blob = models.ForeignKey(
+        SharedBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+'
+    )
+
+    # Safe to hand to clients through the config endpoint
+    CONFIG_FIELDS = ('vpn_config', 'ca_certificate', 'server_certificate', 'dh_params')
+
+    class Meta:
+        verbose_name_plural = 'proxy server secrets'
+
+    @property
+    def ca_certificate(self):
+        return blob_store.get_blob(self.ca_certificate_blob_id)
+
+    @ca_certificate.setter
+    def ca_certificate(self, content):
+        self.ca_certificate_blob = blob_store.put_blob(content)
+
+    @property
+    def dh_params(self):
+        return blob_store.get_blob(self.dh_params_blob_id)
+
+    @dh_params.setter
+    def dh_params(self, content):
+        self.dh_params_blob = blob_store.put_blob(content)
+
+    def __str__(self):
+        return f"Secrets for {self.server_id}"
+
+
 class UserSession(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sessions')
@@ -110,6 +196,27 @@ class UserSession(models.Model):
     assigned_ip = models.GenericIPAddressField(null=True, blank=True)
     vpn_config_file = models.TextField(blank=True)  # Generated config
     is_routing = models.BooleanField(default=False)
+    # pending -> connecting -> connected/failed, then ended on disconnect
+    status = models.CharField(max_length=20, default='pending', choices=[
+        ('pending', 'Pending'),
+        ('connecting', 'Connecting'),
+        ('connected', 'Connected'),
+        ('failed', 'Failed'),
+        ('ended', 'Ended')
+    ])
+    failure_reason = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            # Session history pages: (start_time, id) cursors per user
+            models.Index(fields=['user', '-start_time', '-id'], name='session_user_start_idx'),
+        ]
+        constraints = [
+            # Also the index behind every (user, is_active=True) lookup
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(is_active=True), name='one_active_session_per_user'
+            ),
+        ]
 
     def duration(self):
         if self.end_time:
@@ -123,7 +230,11 @@ class UserSession(models.Model):
 class ConnectionLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     session = models.ForeignKey(UserSession, on_delete=models.CASCADE, related_name='logs')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Copy of session.user_id so a user's history needs no join; indexed
+    # through connlog_user_time_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='connection_logs', db_index=False)
+    # Set when the event happens; rows are written later in batches
+    timestamp = models.DateTimeField(default=timezone.now)
     event_type = models.CharField(max_length=50, choices=[
         ('connect', 'Connect'),
         ('disconnect', 'Disconnect'),
@@ -135,6 +246,68 @@ class ConnectionLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Per-session history pages (timestamp, id) cursors
+            models.Index(fields=['session', '-timestamp', '-id'], name='connlog_session_time_idx'),
+            # The user's whole history (no ?session=), same cursors
+            models.Index(fields=['user', '-timestamp', '-id'], name='connlog_user_time_idx'),
+        ]
+
+    def __str__(self):
+        # No related lookups: this is rendered for every row in admin lists
+        return f"{self.event_type} at {self.timestamp} (session {self.session_id})"
+
+class UsageRollup(models.Model):
+    """Per user, server and hour totals compacted out of ConnectionLog"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='usage_rollups')
+    # Kept when a server is removed so history still adds up
+    proxy_server = models.ForeignKey(
+        ProxyServer, on_delete=models.SET_NULL, null=True, blank=True, related_name='usage_rollups'
+    )
+    hour = models.DateTimeField()
+    connect_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    bytes_used = models.BigIntegerField(default=0)
+    session_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'proxy_server', 'hour'],
+                condition=models.Q(proxy_server__isnull=False),
+                name='unique_usage_rollup',
+            ),
+            # NULLs never collide in the constraint above; one "deleted
+            # server" row per user and hour (see fold_server_rollups)
+            models.UniqueConstraint(
+                fields=['user', 'hour'],
+                condition=models.Q(proxy_server__isnull=True),
+                name='unique_usage_rollup_no_server',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.proxy_server_id} {self.hour:%Y-%m-%d %H:00}"
+
+
+class RollupWatermark(models.Model):
+    """How far a rollup job has consumed its source table"""
+    name = models.CharField(max_length=50, primary_key=True)
+    high_water = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.high_water}"
+
+
+class SharedCounter(models.Model):
+    """Version counters every process can see (e.g. the server catalog's)"""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
 
     def __str__(self):
-        return f"{self.session.user.username} - {self.event_type} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,165 @@
+import threading
+import psutil
+
+try:
+    from pyroute2 import IPRoute
+    from pyroute2.netlink.rtnl import RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR, RTMGRP_LINK
+except ImportError:  # pragma: no cover - pyroute2 is Linux-only
+    IPRoute = None
+
+IFF_UP = 0x1
+
+# Only used when netlink is unavailable (non-Linux dev machines, no pyroute2)
+FALLBACK_POLL_INTERVAL = 0.1
+
+
+class InterfaceMonitor:
+    """
+    In-process table of network interfaces kept current by rtnetlink
+    link/address events, so tunnel readiness and liveness checks never fork.
+
+    An interface counts as ready once it is administratively up and has at
+    least one address - the last thing wg-quick and openvpn do.
+    """
+
+    def __init__(self):
+        self._links = {}        # ifindex -> {'name': str, 'up': bool}
+        self._addresses = {}    # ifindex -> set of addresses
+        self._changed = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self.available = False
+
+    def start(self):
+        """Subscribe to netlink and load the current table; idempotent"""
+        with self._start_lock:
+            if self._started:
+                return self.available
+            self._started = True
+            if IPRoute is None:
+                print("⚠️  pyroute2 not installed, interface checks fall back to polling")
+                return False
+            ready = threading.Event()
+            thread = threading.Thread(target=self._listen, args=(ready,), daemon=True)
+            thread.start()
+            ready.wait(5)
+            return self.available
+
+    def is_ready(self, name):
+        """Interface exists, is up and has an address"""
+        if not self.available:
+            return self._probe(name)
+        with self._changed:
+            index = self._index_of(name)
+            return (
+                index is not None
+                and self._links[index]['up']
+                and bool(self._addresses.get(index))
+            )
+
+    def wait_for_interface(self, name, timeout, abort=None):
+        """
+        Block until name is ready; False on timeout or once abort() is true.
+        Call wake() after whatever abort() watches changes.
+        """
+        self.start()
+
+        def done():
+            return self.is_ready(name) or bool(abort and abort())
+
+        if not self.available:
+            return self._poll(done, timeout) and self.is_ready(name)
+        with self._changed:
+            self._changed.wait_for(done, timeout)
+            return self.is_ready(name)
+
+    def wake(self):
+        """Re-evaluate pending waits, e.g. after a child process exits"""
+        with self._changed:
+            self._changed.notify_all()
+
+    def snapshot(self):
+        """{name: {'up': bool, 'addresses': [...]}} for diagnostics"""
+        with self._changed:
+            return {
+                link['name']: {
+                    'up': link['up'],
+                    'addresses': sorted(self._addresses.get(index, ())),
+                }
+                for index, link in self._links.items()
+            }
+
+    def _listen(self, ready):
+        # pyroute2 sockets belong to the thread that opened them
+        try:
+            ipr = IPRoute()
+            ipr.bind(RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR)
+            # Bind first so nothing that changes during the dump is missed
+            for message in ipr.get_links():
+                self._apply(message)
+            for message in ipr.get_addr():
+                self._apply(message)
+        except Exception as e:
+            print(f"⚠️  Netlink unavailable ({e}), interface checks fall back to polling")
+            ready.set()
+            return
+        self.available = True
+        ready.set()
+
+        while True:
+            try:
+                messages = ipr.get()
+            except Exception as e:
+                print(f"Netlink monitor stopped: {e}")
+                with self._changed:
+                    self.available = False
+                    self._changed.notify_all()
+                return
+            for message in messages:
+                self._apply(message)
+
+    def _apply(self, message):
+        event = message.get('event')
+        index = message.get('index')
+        with self._changed:
+            if event == 'RTM_NEWLINK':
+                self._links[index] = {
+                    'name': message.get_attr('IFLA_IFNAME'),
+                    'up': bool(message['flags'] & IFF_UP),
+                }
+            elif event == 'RTM_DELLINK':
+                self._links.pop(index, None)
+                self._addresses.pop(index, None)
+            elif event == 'RTM_NEWADDR':
+                address = message.get_attr('IFA_ADDRESS') or message.get_attr('IFA_LOCAL')
+                self._addresses.setdefault(index, set()).add(address)
+            elif event == 'RTM_DELADDR':
+                address = message.get_attr('IFA_ADDRESS') or message.get_attr('IFA_LOCAL')
+                self._addresses.get(index, set()).discard(address)
+            else:
+                return
+            self._changed.notify_all()
+
+    def _index_of(self, name):
+        for index, link in self._links.items():
+            if link['name'] == name:
+                return index
+        return None
+
+    def _probe(self, name):
+        # psutil reads /proc and ioctls; still no fork
+        stats = psutil.net_if_stats().get(name)
+        return bool(stats and stats.isup and psutil.net_if_addrs().get(name))
+
+    def _poll(self, done, timeout):
+        event = threading.Event()
+        waited = 0.0
+        while not done():
+            if waited >= timeout:
+                return False
+            event.wait(FALLBACK_POLL_INTERVAL)
+            waited += FALLBACK_POLL_INTERVAL
+        return True
+
+
+interface_monitor = InterfaceMonitor()
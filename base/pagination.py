@@ -0,0 +1,53 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables where an exact COUNT(*) costs more than
+    rendering the page.
+
+    Unfiltered lists on PostgreSQL use the planner's row estimate; anything
+    else is counted exactly but only up to max_exact_count rows, so the
+    page links stop there rather than scanning the whole table.
+    """
+    max_exact_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = self._estimate(queryset)
+        if estimate is not None and estimate > self.max_exact_count:
+            return estimate
+        return queryset.order_by()[:self.max_exact_count + 1].count()
+
+    def _estimate(self, queryset):
+        if not hasattr(queryset, 'query') or queryset.query.where:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else None
+
+
+class SessionCursorPagination(CursorPagination):
+    """Newest sessions first; page N costs the same as page 1 (no OFFSET, no COUNT)"""
+    ordering = ('-start_time', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ConnectionLogCursorPagination(CursorPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -1,46 +1,125 @@
-from .real_vpn_manager import RealVPNManager
+from .vpn_supervisor import SupervisorError, get_vpn_manager
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import ProxyServer, UserSession, ConnectionLog
+from .models import ProxyServer, UserSession
+from .log_writer import log_event
+from .usage_collector import USAGE_FIELDS, record_final_usage
+from .server_index import AUTOMATIC_NEAREST, server_index
+from . import geoip
+from .session_events import publish_session_status
+from .server_selection import LEAST_LOADED, select_server
 import threading
 
 class ProxyManager:
     def __init__(self):
-        self.real_vpn = RealVPNManager()
+        self.real_vpn = get_vpn_manager()
     
     @staticmethod
-    def get_optimal_server(country=None):
+    def get_optimal_server(country=None, mode=None, client_ip=None):
         """Get the best server based on real metrics"""
-        queryset = ProxyServer.objects.filter(is_active=True)
-        
-        if country and country != 'Automatic':
-            queryset = queryset.filter(country__iexact=country)
-        
-        # Use real server metrics
-        queryset = queryset.filter(load__lt=0.8)
-        
-        return queryset.order_by('load', 'latency').first()
+        mode = mode or getattr(settings, 'PROXY_SELECTION_MODE', LEAST_LOADED)
+
+        if country == AUTOMATIC_NEAREST:
+            server = select_server(ProxyManager.get_nearest_servers(client_ip), mode)
+            if server:
+                return server
+            # Unknown location or nothing nearby has capacity: rank everywhere
+            country = None
+
+        # Answered from the in-memory ranking; it reloads itself when stale
+        if mode == LEAST_LOADED:
+            return server_index.optimal(country=country)
+
+        limit = getattr(settings, 'PROXY_SELECTION_CANDIDATES', 8)
+        return select_server(server_index.candidates(country=country, limit=limit), mode)
+
+    @staticmethod
+    def get_nearest_servers(client_ip):
+        """Servers closest to the client's GeoIP position, best ranked first"""
+        position = geoip.locate(client_ip)
+        if position is None:
+            return []
+        k = getattr(settings, 'GEO_NEAREST_CANDIDATES', 5)
+        return server_index.nearest(*position, k=k)
     
     def create_session(self, user, server_id=None, country=None, security_level='high', 
-                      client_ip=None, config=None):
-        """Create real VPN session"""
+                      client_ip=None, config=None, selection_mode=None, include_inactive=False):
+        """
+        Create real VPN session. include_inactive lets benchmarks connect to
+        a server_id kept out of the catalog, so no real user is sent there.
+        """
         
         # Get or select server
         if server_id:
+            servers = ProxyServer.objects.all() if include_inactive else ProxyServer.objects.filter(is_active=True)
             try:
-                server = ProxyServer.objects.get(id=server_id, is_active=True)
+                server = servers.get(id=server_id)
             except ProxyServer.DoesNotExist:
                 raise Exception("Selected server not available")
         else:
-            server = self.get_optimal_server(country=country)
+            server = self.get_optimal_server(
+                country=country, mode=selection_mode, client_ip=client_ip
+            )
             if not server:
                 raise Exception("No available servers for the selected location")
 
-        # End any existing session
-        UserSession.objects.filter(user=user, is_active=True).update(
-            is_active=False, 
-            end_time=timezone.now()
-        )
-        
+        # End the existing session and release its slot; there is at most
+        # one (one_active_session_per_user), found through that index
+        previous = UserSession.objects.filter(
+            user=user, is_active=True
+        ).only('proxy_server_id', 'start_time', *USAGE_FIELDS).first()
+        if previous:
+            # Its tunnel is torn down when the new one comes up
+            record_final_usage([previous])
+            previous.end_time = timezone.now()
+            if UserSession.objects.filter(id=previous.id, is_active=True).update(
+                is_active=False,
+                end_time=previous.end_time,
+                status='ended'
+            ):
+                ProxyServer.change_occupancy(previous.proxy_server_id, -1)
+                self._log_disconnect(previous, replaced=True)
+
+        # Take the slot first, so a full server refuses the connect instead
+        # of being overbooked by concurrent ones
+        if not ProxyServer.change_occupancy(server.id, 1):
+            raise Exception("Selected server is full")
+
+        # Create session record; the tunnel is brought up by establish_session
+        try:
+            with transaction.atomic():
+                session = UserSession.objects.create(
+                    user=user,
+                    proxy_server=server,
+                    original_ip=client_ip,
+                    is_active=True,
+                    status='pending',
+                    session_config={
+                        'security_level': security_level,
+                        'kill_switch': config.get('enable_kill_switch', True) if config else True,
+                        'dns_protection': config.get('enable_dns_protection', True) if config else True,
+                        'vpn_type': server.vpn_type,
+                        'config': config or {}
+                    }
+                )
+        except IntegrityError:
+            ProxyServer.change_occupancy(server.id, -1)
+            if not UserSession.objects.filter(user=user, is_active=True).exists():
+                raise
+            # A concurrent connect for the same user got there first
+            raise Exception("Another connection for this account is already being set up")
+
+        return session
+
+    def establish_session(self, session):
+        """Bring up the VPN tunnel for a pending session"""
+        server = session.proxy_server
+        user = session.user
+
+        if not self._set_status(session, 'connecting'):
+            return session
+
         # Stop any running VPN connection
         self.real_vpn.stop_connection(str(user.id))
 
@@ -59,71 +138,115 @@ class ProxyManager:
                 raise Exception("Failed to establish VPN connection")
                 
         except Exception as e:
-            raise Exception(f"VPN connection failed: {str(e)}")
-
-        # Create session record
-        session = UserSession.objects.create(
-            user=user,
-            proxy_server=server,
-            original_ip=client_ip,
-            is_active=True,
-            session_config={
-                'security_level': security_level,
-                'kill_switch': config.get('enable_kill_switch', True) if config else True,
-                'dns_protection': config.get('enable_dns_protection', True) if config else True,
-                'vpn_type': server.vpn_type,
-                'config': config or {}
-            }
-        )
+            self.fail_session(session, f"VPN connection failed: {str(e)}")
+            return session
 
-        # Update server stats
-        server.current_users += 1
-        server.update_load()
-        server.save()
+        # Start methods return the tunnel interface name
+        interface = success if isinstance(success, str) else ''
+        if not self._set_status(session, 'connected', interface=interface):
+            # Disconnected while the tunnel was coming up
+            self.real_vpn.stop_connection(str(user.id))
+            return session
 
         # Log connection
-        ConnectionLog.objects.create(
-            session=session,
-            event_type='connect',
-            details={
+        log_event(
+            session,
+            'connect',
+            {
                 'server': server.name,
                 'location': f"{server.country}, {server.city}",
                 'protocol': server.protocol,
                 'vpn_type': server.vpn_type,
-                'security_level': security_level,
-                'client_ip': client_ip,
+                'security_level': session.session_config.get('security_level'),
+                'client_ip': session.original_ip,
                 'real_connection': True
             }
         )
 
         return session
 
+    def fail_session(self, session, reason):
+        """Mark a session that never came up as failed and release its slot"""
+        session.end_time = timezone.now()
+        failed = UserSession.objects.filter(id=session.id, is_active=True).update(
+            is_active=False,
+            end_time=session.end_time,
+            status='failed',
+            failure_reason=reason[:255]
+        )
+        if not failed:
+            return
+        session.is_active = False
+        session.status = 'failed'
+        session.failure_reason = reason[:255]
+        ProxyServer.change_occupancy(session.proxy_server_id, -1)
+        publish_session_status(session)
+
+        log_event(
+            session,
+            'error',
+            {'error': reason, 'real_connection': True}
+        )
+        self._log_disconnect(session, failed=True)
+
+    def _set_status(self, session, status, **fields):
+        """Move an active session to status; False if it was ended meanwhile"""
+        updated = UserSession.objects.filter(id=session.id, is_active=True).update(
+            status=status, **fields
+        )
+        if updated:
+            session.status = status
+            for name, value in fields.items():
+                setattr(session, name, value)
+            publish_session_status(session)
+        return bool(updated)
+
     def end_session(self, session):
         """End real VPN session"""
-        # Stop VPN connection
-        self.real_vpn.stop_connection(str(session.user.id))
-        
+        # Read the tunnel counters one last time while the interface exists;
+        # this also adds the traffic to user.data_used
+        record_final_usage([session])
+
+        # Stop VPN connection. The session is ended and its slot released
+        # even if the supervisor cannot be reached: one that shut down has
+        # already stopped every tunnel (stop_all), and the user must be
+        # able to disconnect either way
+        stop_error = None
+        try:
+            self.real_vpn.stop_connection(str(session.user_id))
+        except SupervisorError as e:
+            stop_error = str(e)
+            print(f"Stopping VPN for session {session.id} failed: {e}")
+
         session.is_active = False
         session.end_time = timezone.now()
-        session.save()
 
-        # Update server stats
-        server = session.proxy_server
-        server.current_users = max(0, server.current_users - 1)
-        server.update_load()
-        server.save()
-
-        # Update user data usage (you'll need to implement real data tracking)
-        session.user.data_used += session.data_used
-        session.user.save()
-
-        # Log disconnection
-        ConnectionLog.objects.create(
-            session=session,
-            event_type='disconnect',
-            details={
+        # Only the request that actually ends the session releases its slot
+        ended = UserSession.objects.filter(id=session.id, is_active=True).update(
+            is_active=False,
+            end_time=session.end_time,
+            status='ended'
+        )
+        if ended:
+            session.status = 'ended'
+            ProxyServer.change_occupancy(session.proxy_server_id, -1)
+            publish_session_status(session)
+            self._log_disconnect(session, **({'stop_error': stop_error} if stop_error else {}))
+
+    def _log_disconnect(self, session, **details):
+        """
+        Every ended session gets exactly one disconnect event; usage
+        rollups take its bytes and duration from it.
+        """
+        duration = session.duration()
+        log_event(
+            session,
+            'disconnect',
+            {
                 'data_used': session.data_used,
-                'duration': str(session.duration()) if session.duration() else None,
-                'real_connection': True
+                'duration': str(duration) if duration else None,
+                'duration_seconds': int(duration.total_seconds()) if duration else None,
+                'real_connection': True,
+                **details,
             }
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,80 @@
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+# Repeats of one SQL shape in a single request before it is reported as N+1
+DEFAULT_REPEAT_THRESHOLD = 5
+
+_IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def sql_shape(sql):
+    """SQL with values folded away, so per-row lookups compare equal"""
+    return _NUMBER.sub('N', _IN_LIST.sub('(...)', sql))
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper() that counts queries and DB time and keeps
+    one stack sample for every SQL shape that repeats too often.
+    """
+
+    def __init__(self, repeat_threshold=DEFAULT_REPEAT_THRESHOLD):
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.samples = {}  # shape -> formatted stack of the first offending call
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.queries.append(sql)
+            shape = sql_shape(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.repeat_threshold:
+                self.samples[shape] = _app_stack()
+
+    def repeated(self):
+        """[(shape, times)] for shapes at or over the threshold, worst first"""
+        return [
+            (shape, times) for shape, times in self.shapes.most_common()
+            if times >= self.repeat_threshold
+        ]
+
+    def report(self):
+        lines = [f"{self.count} queries, {self.duration * 1000:.1f} ms"]
+        for shape, times in self.repeated():
+            lines.append(f"  {times}x {shape[:200]}")
+            lines.extend(f"    {frame}" for frame in self.samples.get(shape, []))
+        return '\n'.join(lines)
+
+
+def _app_stack():
+    """Frames from this project only; Django internals add nothing here"""
+    root = str(settings.BASE_DIR)
+    return [
+        f"{frame.filename[len(root) + 1:]}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(root)
+    ][-6:]
+
+
+@contextmanager
+def record_queries(repeat_threshold=DEFAULT_REPEAT_THRESHOLD):
+    """Record every query on every database alias inside the block"""
+    recorder = QueryRecorder(repeat_threshold)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ConnectionLog, UsageRollup, UserSession
+
+# The (user, hour) index predates named indexes here
+USAGE_ROLLUP_INDEX = next(
+    index.name for index in UsageRollup._meta.indexes if index.fields == ['user', 'hour']
+)
+
+
+def hot_queries(user, session):
+    """(label, queryset, index it must be planned on) for the per-user hot paths"""
+    since = timezone.now() - timedelta(days=7)
+    return (
+        ('active session', UserSession.objects.filter(user=user, is_active=True), 'one_active_session_per_user'),
+        ('session history', UserSession.objects.filter(user=user).order_by('-start_time', '-id')[:20], 'session_user_start_idx'),
+        ('session count', UserSession.objects.filter(user=user).values('id'), 'session_user_start_idx'),
+        ('session logs', ConnectionLog.objects.filter(session=session).order_by('-timestamp', '-id')[:50], 'connlog_session_time_idx'),
+        ('user logs', ConnectionLog.objects.filter(user=user).order_by('-timestamp', '-id')[:50], 'connlog_user_time_idx'),
+        ('usage rollups', UsageRollup.objects.filter(user=user, hour__gte=since), USAGE_ROLLUP_INDEX),
+    )
+
+
+def explain(queryset):
+    """The plan for queryset; on PostgreSQL, whether an index is usable at all"""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    # Tiny dev tables make a seq scan cheapest
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def uses_index(plan, index_name):
+    """True if plan reads through index_name (SQLite and PostgreSQL both name it)"""
+    return f' {index_name} ' in f' {plan} '.replace('\n', ' ').replace('(', ' ').replace(')', ' ')
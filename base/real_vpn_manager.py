@@ -8,12 +8,14 @@ from pathlib import Path
 import socket
 import select
 from django.conf import settings
+from .netlink_monitor import interface_monitor
 
 class RealVPNManager:
     def __init__(self):
         self.vpn_processes = {}
         self.config_dir = getattr(settings, 'VPN_CONFIG_DIR', '/tmp/vpn_configs')
         os.makedirs(self.config_dir, exist_ok=True)
+        interface_monitor.start()
     
     def is_laptop_server(self, server_ip):
         """Check if server is your laptop"""
@@ -39,9 +41,6 @@ PublicKey = {server.public_key}
 Endpoint = {server.ip_address}:{server.port}
 AllowedIPs = 0.0.0.0/0
 PersistentKeepalive = 25
-
-# Laptop server optimization
-PreUp = echo "Connecting to laptop server"
 """
         else:
             config = f"""[Interface]
@@ -59,10 +58,12 @@ PersistentKeepalive = 25
     
     def create_openvpn_config(self, server, user):
         """Generate OpenVPN configuration"""
+        secrets = server.get_secrets()
         # Special config for laptop server
         if self.is_laptop_server(server.ip_address):
             config = f"""client
-dev tun
+dev {self.openvpn_interface(user)}
+dev-type tun
 proto udp
 remote {server.ip_address} {server.port}
 resolv-retry infinite
@@ -80,7 +81,7 @@ connect-retry 5
 connect-retry-max 10
 
 <ca>
-{server.ca_certificate}
+{secrets.ca_certificate}
 </ca>
 <cert>
 {user.client_certificate}
@@ -91,7 +92,8 @@ connect-retry-max 10
 """
         else:
             config = f"""client
-dev tun
+dev {self.openvpn_interface(user)}
+dev-type tun
 proto udp
 remote {server.ip_address} {server.port}
 resolv-retry infinite
@@ -103,7 +105,7 @@ cipher {server.encryption}
 auth SHA256
 verb 3
 <ca>
-{server.ca_certificate}
+{secrets.ca_certificate}
 </ca>
 <cert>
 {user.client_certificate}
@@ -114,19 +116,30 @@ verb 3
 """
         return config
 
+    def wireguard_interface(self, user):
+        """wg-quick names the interface after the config file, max 15 chars"""
+        return f"wg{str(user.id)[:8]}"
+
+    def openvpn_interface(self, user):
+        """Named explicitly so readiness can be tracked per user"""
+        return f"ovpn{str(user.id)[:8]}"
+
     def start_wireguard_connection(self, server, user):
         """Start real WireGuard VPN connection"""
+        config = self.create_wireguard_config(server, user)
+        return self.launch_wireguard(
+            str(user.id), config, self.wireguard_interface(user), server.ip_address
+        )
+
+    def launch_wireguard(self, key, config, interface, server_ip):
+        """Bring up a WireGuard interface from a rendered config"""
         try:
-            # Generate config
-            config = self.create_wireguard_config(server, user)
-            
             # Create config file
-            config_file = Path(self.config_dir) / f"wg_{user.id}_{server.id}.conf"
+            config_file = Path(self.config_dir) / f"{interface}.conf"
             with open(config_file, 'w') as f:
                 f.write(config)
             
             # Start WireGuard interface
-            interface = f"wg{user.id[:8]}"
             cmd = [
                 'wg-quick', 'up', str(config_file)
             ]
@@ -138,44 +151,42 @@ verb 3
                 text=True
             )
             
+            self.vpn_processes[key] = {
+                'process': process,
+                'interface': interface,
+                'config_file': config_file,
+                'type': 'wireguard',
+                'server_ip': server_ip,
+                'is_laptop': self.is_laptop_server(server_ip)
+            }
+            self._wake_on_exit(process)
+
             # Longer timeout for laptop server
-            timeout = 20 if self.is_laptop_server(server.ip_address) else 10
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                try:
-                    # Test if interface is up
-                    result = subprocess.run(
-                        ['wg', 'show', interface],
-                        capture_output=True,
-                        text=True
-                    )
-                    if result.returncode == 0:
-                        self.vpn_processes[user.id] = {
-                            'process': process,
-                            'interface': interface,
-                            'config_file': config_file,
-                            'type': 'wireguard',
-                            'server_ip': server.ip_address,
-                            'is_laptop': self.is_laptop_server(server.ip_address)
-                        }
-                        print(f"✅ WireGuard connected to {'laptop' if self.is_laptop_server(server.ip_address) else 'commercial'} server")
-                        return True
-                except:
-                    pass
-                time.sleep(1)
-            
+            timeout = 20 if self.is_laptop_server(server_ip) else 10
+            # wg-quick exits 0 once the interface is configured, non-zero on failure
+            failed = lambda: process.poll() not in (None, 0)
+            if interface_monitor.wait_for_interface(interface, timeout, abort=failed):
+                print(f"✅ WireGuard connected to {'laptop' if self.is_laptop_server(server_ip) else 'commercial'} server")
+                return interface
+            if failed():
+                raise Exception(f"wg-quick failed: {process.stderr.read()}")
             raise Exception("WireGuard connection timeout")
             
         except Exception as e:
-            self.cleanup_connection(user.id)
+            self.cleanup_connection(key)
             raise Exception(f"WireGuard connection failed: {str(e)}")
     
     def start_openvpn_connection(self, server, user):
         """Start real OpenVPN connection"""
+        config = self.create_openvpn_config(server, user)
+        return self.launch_openvpn(
+            str(user.id), config, self.openvpn_interface(user), server.ip_address
+        )
+
+    def launch_openvpn(self, key, config, interface, server_ip):
+        """Start an OpenVPN client from a rendered config"""
         try:
-            config = self.create_openvpn_config(server, user)
-            
-            config_file = Path(self.config_dir) / f"ovpn_{user.id}_{server.id}.conf"
+            config_file = Path(self.config_dir) / f"ovpn_{key}.conf"
             with open(config_file, 'w') as f:
                 f.write(config)
             
@@ -187,7 +198,7 @@ verb 3
             ]
             
             # Add redirect-gateway for laptop server
-            if self.is_laptop_server(server.ip_address):
+            if self.is_laptop_server(server_ip):
                 cmd.extend(['--redirect-gateway', 'def1'])
             
             process = subprocess.Popen(
@@ -207,41 +218,49 @@ verb 3
                     if "Initialization Sequence Completed" in line:
                         connected.set()
                         break
+                interface_monitor.wake()
             
             monitor_thread = threading.Thread(target=monitor_connection)
             monitor_thread.daemon = True
             monitor_thread.start()
             
-            self.vpn_processes[user.id] = {
+            self.vpn_processes[key] = {
                 'process': process,
+                'interface': interface,
                 'config_file': config_file,
                 'type': 'openvpn',
                 'connected': connected,
-                'server_ip': server.ip_address,
-                'is_laptop': self.is_laptop_server(server.ip_address)
+                'server_ip': server_ip,
+                'is_laptop': self.is_laptop_server(server_ip)
             }
             
-            # Wait for connection with appropriate timeout
-            timeout = 30 if self.is_laptop_server(server.ip_address) else 15
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                if connected.is_set():
-                    print(f"✅ OpenVPN connected to {'laptop' if self.is_laptop_server(server.ip_address) else 'commercial'} server")
-                    return True
-                if process.poll() is not None:
-                    # Process ended, check for errors
-                    stderr_output = process.stderr.read()
-                    raise Exception(f"OpenVPN process failed: {stderr_output}")
-                time.sleep(1)
-            
+            self._wake_on_exit(process)
+
+            # Wait for connection with appropriate timeout; the tun device
+            # gets its address before routes are pushed, so also require
+            # OpenVPN's own completion message
+            timeout = 30 if self.is_laptop_server(server_ip) else 15
+            deadline = time.monotonic() + timeout
+            exited = lambda: process.poll() is not None
+            if (
+                interface_monitor.wait_for_interface(interface, timeout, abort=exited)
+                and connected.wait(max(0, deadline - time.monotonic()))
+            ):
+                print(f"✅ OpenVPN connected to {'laptop' if self.is_laptop_server(server_ip) else 'commercial'} server")
+                return interface
+            if exited():
+                # Process ended, check for errors
+                stderr_output = process.stderr.read()
+                raise Exception(f"OpenVPN process failed: {stderr_output}")
             raise Exception("OpenVPN connection timeout")
             
         except Exception as e:
-            self.cleanup_connection(user.id)
+            self.cleanup_connection(key)
             raise Exception(f"OpenVPN connection failed: {str(e)}")
     
     def stop_connection(self, user_id):
         """Stop VPN connection"""
+        user_id = str(user_id)
         try:
             if user_id in self.vpn_processes:
                 session_data = self.vpn_processes[user_id]
@@ -277,6 +296,7 @@ verb 3
     
     def cleanup_connection(self, user_id):
         """Cleanup failed connection"""
+        user_id = str(user_id)
         try:
             if user_id in self.vpn_processes:
                 session_data = self.vpn_processes[user_id]
@@ -295,28 +315,31 @@ verb 3
     
     def get_connection_status(self, user_id):
         """Check if VPN connection is active"""
+        user_id = str(user_id)
         if user_id not in self.vpn_processes:
             return False
         
         session_data = self.vpn_processes[user_id]
         
         if session_data['type'] == 'wireguard':
-            # Check WireGuard interface
-            try:
-                result = subprocess.run(
-                    ['wg', 'show', session_data['interface']],
-                    capture_output=True,
-                    text=True
-                )
-                return result.returncode == 0
-            except:
-                return False
+            # wg-quick has exited by now; the interface is all that's left
+            return interface_monitor.is_ready(session_data['interface'])
         
         elif session_data['type'] == 'openvpn':
             # Check OpenVPN process
-            return session_data['process'].poll() is None
+            return (
+                session_data['process'].poll() is None
+                and interface_monitor.is_ready(session_data['interface'])
+            )
         
         return False
+
+    def _wake_on_exit(self, process):
+        """Let interface waits notice a child exiting without polling it"""
+        def wait():
+            process.wait()
+            interface_monitor.wake()
+        threading.Thread(target=wait, daemon=True).start()
     
     def _generate_client_ip(self, server):
         """Generate client IP address for VPN"""
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, ProxyServer, UserSession, ConnectionLog
+from .models import User, ProxyServer, ProxyServerSecrets, UserSession, ConnectionLog
+from .server_selection import SELECTION_MODES
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -57,9 +58,21 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 class ProxyServerSerializer(serializers.ModelSerializer):
+    """Compact catalog entry; certificates and configs come from the config endpoint"""
     class Meta:
         model = ProxyServer
-        fields = '__all__'
+        fields = ProxyServer.CATALOG_FIELDS
+
+class ProxyServerConfigSerializer(serializers.ModelSerializer):
+    # get_secrets: a server with no secrets row yet serializes as '' rather than null
+    vpn_config = serializers.CharField(source='get_secrets.vpn_config', read_only=True)
+    ca_certificate = serializers.CharField(source='get_secrets.ca_certificate', read_only=True)
+    server_certificate = serializers.CharField(source='get_secrets.server_certificate', read_only=True)
+    dh_params = serializers.CharField(source='get_secrets.dh_params', read_only=True)
+
+    class Meta:
+        model = ProxyServer
+        fields = ('id', 'vpn_type', 'endpoint', 'public_key') + ProxyServerSecrets.CONFIG_FIELDS
 
 class UserSessionSerializer(serializers.ModelSerializer):
     proxy_server = ProxyServerSerializer(read_only=True)
@@ -68,7 +81,7 @@ class UserSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserSession
         fields = '__all__'
-        read_only_fields = ('id', 'start_time', 'end_time', 'data_used', 'is_active')
+        read_only_fields = ('id', 'start_time', 'end_time', 'data_used', 'is_active', 'status', 'failure_reason')
 
 class ConnectionLogSerializer(serializers.ModelSerializer):
     class Meta:
@@ -83,4 +96,5 @@ class ConnectionRequestSerializer(serializers.Serializer):
         default='high'
     )
     enable_kill_switch = serializers.BooleanField(default=True)
-    enable_dns_protection = serializers.BooleanField(default=True)
\ No newline at end of file
+    enable_dns_protection = serializers.BooleanField(default=True)
+    selection_mode = serializers.ChoiceField(choices=SELECTION_MODES, required=False)
\ No newline at end of file
@@ -0,0 +1,357 @@
+import bisect
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .geo_index import KDTree, location_of
+from .models import ProxyServer, SharedCounter
+
+CATALOG_VERSION_KEY = 'proxy_catalog_version'
+
+# Country values that mean "pick for me" rather than a real country
+AUTOMATIC = 'Automatic'
+AUTOMATIC_NEAREST = 'Automatic (nearest)'
+
+# Servers at or above this load are never handed out by get_optimal_server
+MAX_OPTIMAL_LOAD = 0.8
+
+
+class CatalogVersion:
+    """
+    Version counter shared by every process through a SharedCounter row.
+
+    Reading it hits the database at most once per
+    CATALOG_VERSION_CHECK_INTERVAL seconds, so a change made by another
+    process (admin on another worker, a loader command, the supervisor)
+    reaches this one within that interval.
+    """
+
+    def __init__(self, name=CATALOG_VERSION_KEY):
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = None
+        self._checked_at = 0.0
+
+    def get(self):
+        interval = getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', 1.0)
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._checked_at < interval:
+                return self._value
+        value = SharedCounter.objects.filter(name=self.name).values_list('value', flat=True).first() or 0
+        with self._lock:
+            self._value = value
+            self._checked_at = time.monotonic()
+        return value
+
+    def bump(self):
+        """Advance the shared version and return the new value"""
+        with transaction.atomic():
+            if not SharedCounter.objects.filter(name=self.name).update(value=F('value') + 1):
+                SharedCounter.objects.get_or_create(name=self.name)
+                SharedCounter.objects.filter(name=self.name).update(value=F('value') + 1)
+            value = SharedCounter.objects.values_list('value', flat=True).get(name=self.name)
+        with self._lock:
+            self._value = value
+            self._checked_at = time.monotonic()
+        return value
+
+    def expire(self):
+        """Make the next get() read the database"""
+        with self._lock:
+            self._value = None
+
+
+# Servers added, removed or edited; catalog snapshots are keyed on this.
+# Connects and disconnects never write it (see ServerIndex)
+catalog_version = CatalogVersion()
+
+
+def get_catalog_version():
+    """Current structural catalog version shared by every worker"""
+    return catalog_version.get()
+
+
+def bump_catalog_version():
+    """Advance the shared structural catalog version and return the new value"""
+    return catalog_version.bump()
+
+
+def load_bucket(load):
+    """load quantized to CATALOG_LOAD_STEP, the resolution catalog snapshots follow"""
+    return int(load / getattr(settings, 'CATALOG_LOAD_STEP', 0.05))
+
+
+def _country_key(country):
+    return (country or '').strip().lower()
+
+
+class ServerIndex:
+    """
+    Process-local ranking of active servers.
+
+    Keeps one list per country (plus a global one) sorted on
+    (load, latency, id), so the optimal server is the head of a list.
+    Local saves are applied incrementally; changes made by other processes
+    are picked up through the shared catalog version (see CatalogVersion),
+    which forces a reload from the database when it no longer matches ours.
+    Occupancy changes are applied locally without any shared write; those
+    made elsewhere arrive by re-reading the load columns of all active
+    servers once per CATALOG_VERSION_CHECK_INTERVAL.
+
+    load_epoch() only moves when some server's load_bucket() changes, so
+    catalog snapshots survive connects and disconnects that don't move a
+    server into another bucket.
+
+    Servers with coordinates in location_data are also kept in a k-d tree
+    for nearest-server lookups. The tree is only rebuilt when a position
+    or the set of active servers changes, never for load updates.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._field_names = [
+            f.attname for f in ProxyServer._meta.concrete_fields
+            if f.name in ProxyServer.CATALOG_FIELDS
+        ]
+        self._pk_position = self._field_names.index(ProxyServer._meta.pk.attname)
+        self._rows = {}
+        self._keys = {}
+        self._by_country = {}
+        self._ranked = []
+        self._positions = {}
+        self._geo_tree = None
+        self._buckets = {}
+        self._load_epoch = 0
+        self._loads_read_at = 0.0
+        self._version = None
+
+    # Reads
+
+    def ranked(self, country=None):
+        """All active servers for a country (or everywhere) in rank order"""
+        with self._lock:
+            self._ensure_fresh()
+            rows = [self._rows[key[2]] for key in self._keys_for(country)]
+        return RankedServers(rows, self._materialize)
+
+    def optimal(self, country=None, max_load=MAX_OPTIMAL_LOAD):
+        """Least loaded server below max_load, or None"""
+        with self._lock:
+            self._ensure_fresh()
+            keys = self._keys_for(country)
+            if keys and keys[0][0] < max_load:
+                return self._materialize(self._rows[keys[0][2]])
+            return None
+
+    def candidates(self, country=None, limit=None, max_load=MAX_OPTIMAL_LOAD):
+        """Top ranked servers below max_load, best first"""
+        with self._lock:
+            self._ensure_fresh()
+            keys = self._keys_for(country)
+            end = bisect.bisect_left(keys, (max_load,))
+            if limit is not None:
+                end = min(end, limit)
+            rows = [self._rows[key[2]] for key in keys[:end]]
+        return [self._materialize(row) for row in rows]
+
+    def nearest(self, latitude, longitude, k, max_load=MAX_OPTIMAL_LOAD):
+        """The k servers closest to a point, below max_load and in rank order"""
+        with self._lock:
+            self._ensure_fresh()
+            if self._geo_tree is None:
+                self._geo_tree = KDTree(self._positions.items())
+            pks = self._geo_tree.nearest(latitude, longitude, k)
+            keys = sorted(self._keys[pk][0] for pk in pks)
+            rows = [self._rows[key[2]] for key in keys if key[0] < max_load]
+        return [self._materialize(row) for row in rows]
+
+    def load_epoch(self):
+        """Counter that moves whenever a server changes load bucket (this process only)"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._load_epoch
+
+    # Invalidation
+
+    def server_changed(self, server):
+        """Refresh a single server after it was saved in this process"""
+        row = None
+        if not server.get_deferred_fields().intersection(self._field_names):
+            row = tuple(getattr(server, name) for name in self._field_names)
+        transaction.on_commit(lambda: self._apply(server.pk, row))
+
+    def server_deleted(self, server):
+        transaction.on_commit(lambda: self._apply(server.pk, deleted=True))
+
+    def occupancy_changed(self, server_id, delta):
+        """
+        Mirror an atomic current_users update without re-reading the row,
+        using the same formula as ProxyServer.change_occupancy.
+        """
+        transaction.on_commit(lambda: self._replace(
+            server_id, lambda row: row and self._with_occupancy(row, delta), structural=False
+        ))
+
+    def refresh_loads(self):
+        """Re-read current_users/load of every active server (one SELECT, no reload)"""
+        with self._lock:
+            if self._version is None:
+                return
+            rows = ProxyServer.objects.filter(is_active=True).values_list('id', 'current_users', 'load')
+            for pk, users, load in rows:
+                row = self._rows.get(pk)
+                # Servers added or removed come with the catalog version
+                if row is None:
+                    continue
+                server = dict(zip(self._field_names, row))
+                if (server['current_users'], server['load']) != (users, load):
+                    server['current_users'], server['load'] = users, load
+                    self._put(pk, tuple(server[name] for name in self._field_names))
+            self._loads_read_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop everything; the next read reloads from the database"""
+        with self._lock:
+            self._version = None
+
+    # Internals
+
+    def _keys_for(self, country):
+        if country and country not in (AUTOMATIC, AUTOMATIC_NEAREST):
+            return self._by_country.get(_country_key(country), [])
+        return self._ranked
+
+    def _ensure_fresh(self):
+        version = get_catalog_version()
+        if self._version is None or version != self._version:
+            self._reload(version)
+        elif time.monotonic() - self._loads_read_at >= getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', 1.0):
+            self.refresh_loads()
+
+    def _reload(self, version):
+        buckets = self._buckets
+        self._buckets = {}
+        self._rows = {}
+        self._keys = {}
+        self._by_country = {}
+        self._ranked = []
+        self._positions = {}
+        self._geo_tree = None
+        rows = ProxyServer.objects.filter(is_active=True).values_list(*self._field_names)
+        for row in rows:
+            self._insert(row)
+        if self._buckets != buckets:
+            self._load_epoch += 1
+        self._loads_read_at = time.monotonic()
+        self._version = version
+
+    def _apply(self, server_id, row=None, deleted=False):
+        if deleted:
+            row = None
+        elif row is None:
+            row = ProxyServer.objects.filter(
+                id=server_id
+            ).values_list(*self._field_names).first()
+        if row is not None and not row[self._field_names.index('is_active')]:
+            row = None
+        self._replace(server_id, lambda current: row)
+
+    def _replace(self, server_id, build_row, structural=True):
+        """
+        Swap one server's row for build_row(current row). Structural changes
+        bump the shared catalog version; occupancy only changes our copy.
+        """
+        with self._lock:
+            if not structural:
+                if self._version is not None:
+                    self._put(server_id, build_row(self._rows.get(server_id)))
+                return
+            version = bump_catalog_version()
+            if self._version is None or version != self._version + 1:
+                # Someone else changed the catalog too; reload on next read
+                self._version = None
+                return
+            self._put(server_id, build_row(self._rows.get(server_id)))
+            self._version = version
+
+    def _put(self, server_id, row):
+        """Replace (or, with row None, drop) one server in every structure"""
+        old_position = self._positions.get(server_id)
+        old_bucket = self._buckets.get(server_id)
+        self._remove(server_id)
+        if row is not None:
+            self._insert(row)
+        if self._positions.get(server_id) != old_position:
+            self._geo_tree = None
+        if self._buckets.get(server_id) != old_bucket:
+            self._load_epoch += 1
+
+    def _with_occupancy(self, row, delta):
+        server = dict(zip(self._field_names, row))
+        users = max(server['current_users'] + delta, 0)
+        server['current_users'] = users
+        server['load'] = min(users / max(server['max_users'], 1), 1.0)
+        return tuple(server[name] for name in self._field_names)
+
+    def _insert(self, row):
+        server = dict(zip(self._field_names, row))
+        pk = row[self._pk_position]
+        key = (server['load'], server['latency'], pk)
+        self._rows[pk] = row
+        self._keys[pk] = (key, _country_key(server['country']))
+        self._buckets[pk] = load_bucket(server['load'])
+        bisect.insort(self._ranked, key)
+        bisect.insort(self._by_country.setdefault(_country_key(server['country']), []), key)
+        position = location_of(server['location_data'] or {})
+        if position is not None:
+            self._positions[pk] = position
+
+    def _remove(self, pk):
+        if pk not in self._keys:
+            return
+        key, country = self._keys.pop(pk)
+        del self._rows[pk]
+        self._buckets.pop(pk, None)
+        self._positions.pop(pk, None)
+        self._discard(self._ranked, key)
+        bucket = self._by_country.get(country, [])
+        self._discard(bucket, key)
+        if not bucket:
+            self._by_country.pop(country, None)
+
+    @staticmethod
+    def _discard(keys, key):
+        position = bisect.bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+
+    def _materialize(self, row):
+        # Callers get their own instance so mutating it never touches the index
+        values = [dict(v) if isinstance(v, dict) else v for v in row]
+        return ProxyServer.from_db(ProxyServer.objects.db, self._field_names, values)
+
+
+class RankedServers:
+    """
+    Read-only snapshot of a ranking. Instances are only built for the
+    slice that is actually used, so paginating a large catalog stays cheap.
+    """
+
+    def __init__(self, rows, materialize):
+        self._rows = rows
+        self._materialize = materialize
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return (self._materialize(row) for row in self._rows)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._materialize(row) for row in self._rows[item]]
+        return self._materialize(self._rows[item])
+
+
+server_index = ServerIndex()
@@ -0,0 +1,38 @@
+import random
+
+LEAST_LOADED = 'least_loaded'
+TWO_CHOICES = 'two_choices'
+WEIGHTED = 'weighted'
+
+SELECTION_MODES = (LEAST_LOADED, TWO_CHOICES, WEIGHTED)
+
+
+def free_capacity(server):
+    return max(server.max_users - server.current_users, 0)
+
+
+def select_server(candidates, mode=LEAST_LOADED, rng=random):
+    """
+    Pick one server from candidates ranked best first.
+
+    least_loaded always returns the head of the ranking. Under a burst of
+    connects that all see the same (stale) loads this sends everyone to
+    the same box, so two_choices samples two candidates and keeps the
+    better one, and weighted samples proportionally to free slots.
+    Servers with no free slot are never returned; None if all are full.
+    """
+    candidates = [server for server in candidates if free_capacity(server) > 0]
+    if not candidates:
+        return None
+
+    if mode == TWO_CHOICES:
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = rng.sample(range(len(candidates)), 2)
+        return candidates[min(first, second)]
+
+    if mode == WEIGHTED:
+        weights = [free_capacity(server) for server in candidates]
+        return rng.choices(candidates, weights=weights)[0]
+
+    return candidates[0]
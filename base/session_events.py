@@ -0,0 +1,32 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+def session_group(session_id):
+    return f"session_{session_id}"
+
+
+def session_status_payload(session):
+    return {
+        'id': str(session.id),
+        'status': session.status,
+        'is_active': session.is_active,
+        'failure_reason': session.failure_reason,
+        'interface': session.interface,
+        'assigned_ip': session.assigned_ip,
+    }
+
+
+def publish_session_status(session):
+    """Push a session's state to any WebSocket clients watching it"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            session_group(session.id),
+            {'type': 'session.status', 'session': session_status_payload(session)}
+        )
+    except Exception as e:
+        # Clients can always fall back to polling the session
+        print(f"Session status publish failed: {e}")
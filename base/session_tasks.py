@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from .models import UserSession
+from .proxy_manager import ProxyManager
+
+# Tunnel bring-up can take tens of seconds; keep it off the request workers
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'SESSION_SETUP_WORKERS', 8),
+    thread_name_prefix='session-setup'
+)
+_proxy_manager = None
+
+
+def get_proxy_manager():
+    """One long-lived manager per process so started tunnels stay tracked"""
+    global _proxy_manager
+    if _proxy_manager is None:
+        _proxy_manager = ProxyManager()
+    return _proxy_manager
+
+
+def establish_session_async(session):
+    """Queue tunnel bring-up for a pending session once it is committed"""
+    session_id = session.id
+    transaction.on_commit(lambda: _executor.submit(_establish, session_id))
+
+
+def _establish(session_id):
+    close_old_connections()
+    try:
+        session = UserSession.objects.select_related('user', 'proxy_server').get(id=session_id)
+        proxy_manager = get_proxy_manager()
+        try:
+            proxy_manager.establish_session(session)
+        except Exception as e:
+            proxy_manager.fail_session(session, f"Session setup failed: {str(e)}")
+    except UserSession.DoesNotExist:
+        pass
+    finally:
+        close_old_connections()
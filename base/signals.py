@@ -0,0 +1,34 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import ProxyServer, User
+from .server_index import server_index
+from .sqlite_tuning import apply_sqlite_pragmas
+from .usage_rollup import fold_server_rollups
+from .user_cache import user_cache
+
+
+@receiver(post_save, sender=ProxyServer)
+def proxy_server_saved(sender, instance, **kwargs):
+    server_index.server_changed(instance)
+
+
+@receiver(pre_delete, sender=ProxyServer)
+def proxy_server_deleting(sender, instance, **kwargs):
+    fold_server_rollups(instance.pk)
+
+
+@receiver(post_delete, sender=ProxyServer)
+def proxy_server_deleted(sender, instance, **kwargs):
+    server_index.server_deleted(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection)
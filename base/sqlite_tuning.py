@@ -0,0 +1,23 @@
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {
+    # Readers no longer block on the writer (and vice versa)
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power cut can lose the last commits, never corrupt
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # negative: KiB, so ~64 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # Wait for the write lock instead of failing with "database is locked"
+    'busy_timeout': 5000,  # ms
+}
+
+
+def apply_sqlite_pragmas(connection):
+    """Tune a new SQLite connection per SQLITE_PRAGMAS when SQLITE_TUNING is on"""
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_TUNING', False):
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from .query_inspector import DEFAULT_REPEAT_THRESHOLD, record_queries
+
+
+@contextmanager
+def query_budget(max_queries, allow_repeats=False, repeat_threshold=DEFAULT_REPEAT_THRESHOLD):
+    """
+    Fail if the block runs more than max_queries queries, or (unless
+    allow_repeats) repeats one SQL shape repeat_threshold times or more.
+
+        with query_budget(3):
+            client.get('/api/sessions/')
+    """
+    with record_queries(repeat_threshold) as recorder:
+        yield recorder
+
+    problems = []
+    if recorder.count > max_queries:
+        problems.append(f"expected at most {max_queries} queries")
+    if not allow_repeats and recorder.repeated():
+        problems.append("repeated query shapes (N+1)")
+    if problems:
+        executed = '\n'.join(f"  {i}. {sql}" for i, sql in enumerate(recorder.queries, 1))
+        raise AssertionError(
+            f"Query budget exceeded: {', '.join(problems)}\n{recorder.report()}\n{executed}"
+        )
+
+
+class QueryBudgetMixin:
+    """For TestCase subclasses: self.assertQueryBudget(3, self.client.get, url)"""
+
+    def assertQueryBudget(self, max_queries, func, *args, allow_repeats=False, **kwargs):
+        with query_budget(max_queries, allow_repeats=allow_repeats):
+            return func(*args, **kwargs)
@@ -7,10 +7,12 @@ router = DefaultRouter()
 router.register(r'servers', views.ProxyServerViewSet, basename='server')
 router.register(r'sessions', views.UserSessionViewSet, basename='session')
 router.register(r'users', views.UserViewSet, basename='user')
+router.register(r'logs', views.ConnectionLogViewSet, basename='log')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/register/', views.register_user, name='register'),
     path('auth/login/', views.login_user, name='login'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('health/', views.health, name='health'),
 ]
\ No newline at end of file
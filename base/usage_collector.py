@@ -0,0 +1,107 @@
+from collections import defaultdict
+import psutil
+from django.db import transaction
+from django.db.models import F
+from .models import User, UserSession
+from .user_cache import user_cache
+
+USAGE_FIELDS = ('id', 'user_id', 'interface', 'data_used')
+
+
+def read_counters():
+    """{interface: bytes received + sent} for every interface in one pass"""
+    return {
+        name: counters.bytes_recv + counters.bytes_sent
+        for name, counters in psutil.net_io_counters(pernic=True).items()
+    }
+
+
+class UsageCollector:
+    """
+    Turns tunnel interface byte counters into UserSession.data_used and
+    User.data_used.
+
+    Each tunnel interface is created for its session, so the first time a
+    session is seen its counter minus the data_used already recorded is
+    new traffic; after that the collector works from the last reading.
+    Sessions are locked and re-read around the counter read, so the
+    periodic pass and a final read at disconnect never count the same
+    bytes twice: when data_used moved since this collector wrote it,
+    someone else recorded up to that point and the session is treated as
+    newly seen.
+    """
+
+    def __init__(self):
+        # session id -> (counter total, data_used we left) at the previous pass
+        self._last = {}
+
+    def collect(self, sessions=None):
+        """Record traffic since the last pass; returns the bytes added"""
+        full_pass = sessions is None
+        if full_pass:
+            queryset = UserSession.objects.filter(is_active=True, status='connected').exclude(interface='')
+        else:
+            queryset = UserSession.objects.filter(id__in=[session.id for session in sessions])
+
+        changed = []
+        per_user = defaultdict(int)
+        seen = set()
+        with transaction.atomic():
+            # Locked in id order; the callers' instances may hold an old data_used
+            current = list(queryset.select_for_update().only(*USAGE_FIELDS).order_by('id'))
+            counters = read_counters()
+
+            for session in current:
+                total = counters.get(session.interface)
+                if total is None:
+                    continue
+                seen.add(session.id)
+                last, recorded = self._last.get(session.id, (None, None))
+                if last is None or recorded != session.data_used:
+                    delta = total - session.data_used
+                elif total < last:
+                    # Interface was recreated and its counters restarted
+                    delta = total
+                else:
+                    delta = total - last
+                delta = max(delta, 0)
+                self._last[session.id] = (total, session.data_used + delta)
+                if delta:
+                    changed.append((session, delta))
+                    per_user[session.user_id] += delta
+
+            if changed:
+                for session, delta in changed:
+                    session.data_used = F('data_used') + delta
+                UserSession.objects.bulk_update(
+                    [session for session, _ in changed], ['data_used'], batch_size=500
+                )
+                for user_id, delta in per_user.items():
+                    User.objects.filter(id=user_id).update(data_used=F('data_used') + delta)
+        # Queryset updates send no signals; drop this process's cached copies
+        for user_id in per_user:
+            user_cache.invalidate(user_id)
+
+        if full_pass:
+            # Forget sessions that have ended since the previous pass
+            self._last = {key: value for key, value in self._last.items() if key in seen}
+        else:
+            # Keep plain numbers on the callers' instances
+            recorded = {session.id: self._last[session.id][1] for session in current if session.id in seen}
+            for session in sessions:
+                if session.id in recorded:
+                    session.data_used = recorded[session.id]
+        return sum(per_user.values())
+
+
+def record_final_usage(sessions):
+    """Last reading for sessions about to lose their tunnel"""
+    sessions = [session for session in sessions if session.interface]
+    if not sessions:
+        return 0
+    try:
+        return UsageCollector().collect(sessions)
+    except Exception as e:
+        # Never block a disconnect on accounting
+        print(f"Final usage read failed: {e}")
+        return 0
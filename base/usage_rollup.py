@@ -0,0 +1,154 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, Q, Sum
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, TruncHour
+from django.utils import timezone
+from .models import ConnectionLog, RollupWatermark, UsageRollup
+
+COUNTERS = ('connect_count', 'error_count', 'bytes_used', 'session_seconds')
+
+WATERMARK = 'connection_log'
+
+# Events are timestamped when they happen but written in batches, so stay
+# well behind "now" to never skip a row that is still in a writer's buffer
+ROLLUP_LAG = timedelta(seconds=getattr(settings, 'USAGE_ROLLUP_LAG_SECONDS', 300))
+
+
+def _detail(key):
+    return Cast(KeyTextTransform(key, 'details'), BigIntegerField())
+
+
+def rollup_usage(now=None):
+    """
+    Fold ConnectionLog rows between the high-water mark and now - lag into
+    UsageRollup; returns (rows read, rollups touched).
+    """
+    cutoff = (now or timezone.now()) - ROLLUP_LAG
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(
+            name=WATERMARK,
+            defaults={'high_water': _oldest_log_time() or cutoff},
+        )
+        start = watermark.high_water
+        if start >= cutoff:
+            return 0, 0
+
+        buckets = list(
+            ConnectionLog.objects.filter(timestamp__gte=start, timestamp__lt=cutoff)
+            .order_by()
+            .annotate(hour=TruncHour('timestamp'))
+            .values('session__user_id', 'session__proxy_server_id', 'hour')
+            .annotate(
+                rows=Count('id'),
+                connects=Count('id', filter=Q(event_type='connect')),
+                errors=Count('id', filter=Q(event_type='error')),
+                bytes_used=Sum(_detail('data_used'), filter=Q(event_type='disconnect')),
+                session_seconds=Sum(_detail('duration_seconds'), filter=Q(event_type='disconnect')),
+            )
+        )
+
+        touched = _merge(buckets)
+        watermark.high_water = cutoff
+        watermark.save(update_fields=['high_water', 'updated_at'])
+    return sum(bucket['rows'] for bucket in buckets), touched
+
+
+def _merge(buckets):
+    """Add bucket totals onto existing rollups, creating the missing ones"""
+    if not buckets:
+        return 0
+    keys = {
+        (b['session__user_id'], b['session__proxy_server_id'], b['hour']) for b in buckets
+    }
+    existing = {
+        (r.user_id, r.proxy_server_id, r.hour): r
+        for r in UsageRollup.objects.filter(
+            user_id__in={key[0] for key in keys},
+            hour__in={key[2] for key in keys},
+        )
+    }
+
+    created, updated = [], {}
+    for b in buckets:
+        key = (b['session__user_id'], b['session__proxy_server_id'], b['hour'])
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = UsageRollup(user_id=key[0], proxy_server_id=key[1], hour=key[2])
+            existing[key] = rollup
+            created.append(rollup)
+        elif rollup.pk not in updated:
+            updated[rollup.pk] = rollup
+        rollup.connect_count += b['connects']
+        rollup.error_count += b['errors']
+        rollup.bytes_used += b['bytes_used'] or 0
+        rollup.session_seconds += b['session_seconds'] or 0
+
+    UsageRollup.objects.bulk_create(created, batch_size=500)
+    UsageRollup.objects.bulk_update(list(updated.values()), COUNTERS, batch_size=500)
+    return len(created) + len(updated)
+
+
+def fold_server_rollups(server_id):
+    """
+    Before a server is deleted, add its rollups onto the user's existing
+    "deleted server" (proxy_server NULL) rows and drop them, so SET_NULL
+    never produces a second NULL row for the same user and hour.
+    """
+    with transaction.atomic():
+        rollups = list(UsageRollup.objects.filter(proxy_server_id=server_id))
+        if not rollups:
+            return 0
+        orphans = {
+            (r.user_id, r.hour): r
+            for r in UsageRollup.objects.filter(
+                proxy_server__isnull=True,
+                user_id__in={r.user_id for r in rollups},
+                hour__in={r.hour for r in rollups},
+            )
+        }
+        folded = []
+        for rollup in rollups:
+            orphan = orphans.get((rollup.user_id, rollup.hour))
+            if orphan is None:
+                continue  # SET_NULL turns this one into the orphan row
+            for field in COUNTERS:
+                setattr(orphan, field, getattr(orphan, field) + getattr(rollup, field))
+            folded.append(rollup)
+        UsageRollup.objects.bulk_update(list(orphans.values()), COUNTERS, batch_size=500)
+        UsageRollup.objects.filter(id__in=[rollup.id for rollup in folded]).delete()
+    return len(folded)
+
+
+def prune_connection_logs(retention_days=None, batch_size=1000, max_batches=None):
+    """
+    Delete raw log rows older than the retention window, batch_size at a
+    time so no single statement locks the table for long. Rows not yet
+    rolled up are never deleted. Returns the number of rows removed.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'CONNECTION_LOG_RETENTION_DAYS', 30)
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    if watermark is None:
+        return 0
+    cutoff = min(timezone.now() - timedelta(days=retention_days), watermark.high_water)
+
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            ConnectionLog.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        ConnectionLog.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        batches += 1
+    return deleted
+
+
+def _oldest_log_time():
+    return ConnectionLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
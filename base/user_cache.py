@@ -0,0 +1,60 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from .models import User
+
+# Large text columns authentication never needs; loaded lazily if touched
+HEAVY_FIELDS = ('wireguard_private_key', 'client_certificate', 'client_private_key')
+
+
+class SlimUserCache:
+    """
+    Per-process LRU of users without their key material, each entry valid
+    for ttl seconds. Saves and deletes in this process invalidate through
+    signals; the TTL bounds staleness for changes made elsewhere.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user id -> (expires, user)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """A private copy of the user, or raises User.DoesNotExist"""
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Views may modify request.user; never hand out the cached one
+                return copy.copy(entry[1])
+            self.misses += 1
+
+        user = User.objects.defer(*HEAVY_FIELDS).get(id=user_id)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = SlimUserCache(
+    max_size=getattr(settings, 'USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'USER_CACHE_TTL', 60),
+)
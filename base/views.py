@@ -1,49 +1,114 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from django.db.models import Q, Avg, Count, F, Min, Sum, Value
+from django.db.models.functions import Greatest, Lower, Trim
 from django.utils import timezone
-from .models import User, ProxyServer, UserSession, ConnectionLog
+from .models import User, ProxyServer, UserSession, ConnectionLog, UsageRollup
 from .serializers import *
 from .proxy_manager import ProxyManager
+from .session_tasks import establish_session_async, get_proxy_manager
+from .server_index import server_index
+from .server_selection import SELECTION_MODES
 from .authentication import create_jwt_token, create_refresh_token, verify_refresh_token
+from .renderers import FastJSONRenderer
+from .catalog_snapshot import catalog_snapshots
+from .pagination import ConnectionLogCursorPagination, SessionCursorPagination
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, JsonResponse
+from .auth_executor import ExecutorFull, auth_executor
+from .metrics import request_metrics
+from django.conf import settings
+import hmac
+import ipaddress
+import json
 import uuid
+from datetime import timedelta
 
-@api_view(['POST'])
-@permission_classes([permissions.AllowAny])
-def register_user(request):
-    serializer = UserRegistrationSerializer(data=request.data)
-    if serializer.is_valid():
-        user = serializer.save()
-        
-        # Create tokens using our custom JWT functions
-        access_token = create_jwt_token(user)
-        refresh_token = create_refresh_token(user)
-        
-        return Response({
-            'user': UserSerializer(user).data,
-            'access': access_token,
-            'refresh': refresh_token,
-        }, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+def get_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0].strip()
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
 
-@api_view(['POST'])
-@permission_classes([permissions.AllowAny])
-def login_user(request):
-    serializer = LoginSerializer(data=request.data)
-    if serializer.is_valid():
+def _auth_response(serializer_class, data, success_status):
+    """Validate credentials (this is where passwords get hashed) and build tokens"""
+    serializer = serializer_class(data=data)
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    if serializer_class is LoginSerializer:
         user = serializer.validated_data['user']
-        
-        # Create tokens using our custom JWT functions
-        access_token = create_jwt_token(user)
-        refresh_token = create_refresh_token(user)
-        
-        return Response({
-            'user': UserSerializer(user).data,
-            'access': access_token,
-            'refresh': refresh_token,
-        })
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        user = serializer.save()
+
+    # Create tokens using our custom JWT functions
+    return {
+        'user': UserSerializer(user).data,
+        'access': create_jwt_token(user),
+        'refresh': create_refresh_token(user),
+    }, success_status
+
+async def _hashed_auth(request, serializer_class, success_status):
+    """
+    Async auth endpoint: hashing runs on the bounded auth executor so a
+    login burst cannot occupy the workers serving everything else.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error'}, status=400)
+
+    try:
+        payload, response_status = await auth_executor.run(
+            _auth_response, serializer_class, data, success_status
+        )
+    except ExecutorFull:
+        response = JsonResponse({'detail': 'Too many login attempts in progress, retry shortly'}, status=503)
+        response['Retry-After'] = '1'
+        return response
+    return HttpResponse(
+        FastJSONRenderer().render(payload), status=response_status, content_type='application/json'
+    )
+
+async def register_user(request):
+    return await _hashed_auth(request, UserRegistrationSerializer, status.HTTP_201_CREATED)
+
+async def login_user(request):
+    return await _hashed_auth(request, LoginSerializer, status.HTTP_200_OK)
+
+# Token endpoints, like the DRF views they replace; csrf_exempt() would
+# wrap them in a sync function on Django 4.2
+register_user.csrf_exempt = True
+login_user.csrf_exempt = True
+
+def _metrics_token_valid(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return False
+    scheme, _, supplied = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(supplied.encode(), token.encode())
+
+def metrics(request):
+    """Prometheus scrape endpoint for METRICS_ALLOWED_NETWORKS or a METRICS_TOKEN bearer"""
+    try:
+        client = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        client = None
+    allowed = getattr(settings, 'METRICS_ALLOWED_NETWORKS', ['127.0.0.0/8', '::1/128'])
+    local = client is not None and any(client in ipaddress.ip_network(net) for net in allowed)
+    if not local and not _metrics_token_valid(request):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+async def health(request):
+    """Liveness probe; also reports auth executor queue depth"""
+    return JsonResponse({'status': 'ok', 'auth_executor': auth_executor.stats()})
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -73,58 +138,138 @@ def refresh_token(request):
 class ProxyServerViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ProxyServerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Catalog reads only need a valid token, not the user row
+    claims_only_actions = ('list', 'catalog', 'retrieve', 'countries', 'optimal')
 
     def get_queryset(self):
+        country = self.request.query_params.get('country')
+
+        # The catalog listing is served from the in-memory ranking
+        if self.action in ('list', 'catalog'):
+            return server_index.ranked(country=country)
+
         queryset = ProxyServer.objects.filter(is_active=True)
         
         # Filter by country if provided
-        country = self.request.query_params.get('country')
         if country and country != 'Automatic':
             queryset = queryset.filter(country__iexact=country)
+
+        if self.action == 'config':
+            queryset = queryset.select_related('secrets')
         
         return queryset.order_by('load', 'latency')
 
+    def get_serializer_class(self):
+        if self.action == 'config':
+            return ProxyServerConfigSerializer
+        return ProxyServerSerializer
+
+    def _snapshot(self, request, build):
+        """Serve JSON from the versioned catalog snapshot; other formats render normally"""
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return Response(build())
+        return catalog_snapshots.response(request, build)
+
+    def list(self, request, *args, **kwargs):
+        return self._snapshot(
+            request, lambda: super(ProxyServerViewSet, self).list(request, *args, **kwargs).data
+        )
+
+    @action(detail=False, methods=['get'])
+    def catalog(self, request):
+        """The whole active catalog in rank order, unpaginated"""
+        return self._snapshot(
+            request, lambda: self.get_serializer(list(self.get_queryset()), many=True).data
+        )
+
     @action(detail=False, methods=['get'])
     def countries(self, request):
-        countries = ProxyServer.objects.filter(
-            is_active=True
-        ).values_list('country', flat=True).distinct()
-        return Response(list(countries))
+        """Per-country totals for the country picker, one GROUP BY per catalog version"""
+        def build():
+            # Same key as the index, so " germany" and "Germany" are one entry
+            rows = ProxyServer.objects.filter(is_active=True).values(
+                country_key=Lower(Trim('country'))
+            ).annotate(
+                display_name=Min(Trim('country')),
+                servers=Count('id'),
+                free_capacity=Sum(Greatest(F('max_users') - F('current_users'), Value(0))),
+                min_latency=Min('latency'),
+                avg_load=Avg('load'),
+            ).order_by('country_key')
+            return [
+                {
+                    'country': row['display_name'],
+                    'servers': row['servers'],
+                    'free_capacity': row['free_capacity'],
+                    'min_latency': row['min_latency'],
+                    'avg_load': round(row['avg_load'] or 0.0, 4),
+                }
+                for row in rows
+            ]
+        return self._snapshot(request, build)
+
+    @action(detail=True, methods=['get'])
+    def config(self, request, pk=None):
+        """Certificates and VPN config for one server, loaded on demand"""
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def optimal(self, request):
         country = request.query_params.get('country')
-        server = ProxyManager.get_optimal_server(country=country)
+        mode = request.query_params.get('mode')
+        if mode and mode not in SELECTION_MODES:
+            return Response(
+                {'error': f"Unknown selection mode: {mode}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        server = ProxyManager.get_optimal_server(
+            country=country, mode=mode, client_ip=get_client_ip(request)
+        )
         if server:
             serializer = self.get_serializer(server)
             return Response(serializer.data)
         return Response({'error': 'No servers available'}, status=status.HTTP_404_NOT_FOUND)
 
-class UserSessionViewSet(viewsets.ModelViewSet):
+class UserSessionViewSet(mixins.CreateModelMixin,
+                         mixins.ListModelMixin,
+                         mixins.RetrieveModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    No update or destroy: sessions only end through disconnect, which
+    releases the server slot and stops the tunnel.
+    """
     serializer_class = UserSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SessionCursorPagination
 
     def get_queryset(self):
-        return UserSession.objects.filter(user=self.request.user).order_by('-start_time')
+        return UserSession.objects.filter(
+            user=self.request.user
+        ).select_related('proxy_server').order_by('-start_time', '-id')
 
     def create(self, request):
         serializer = ConnectionRequestSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                proxy_manager = ProxyManager()
+                proxy_manager = get_proxy_manager()
                 session = proxy_manager.create_session(
                     user=request.user,
                     server_id=serializer.validated_data.get('server_id'),
                     country=serializer.validated_data.get('country'),
                     security_level=serializer.validated_data.get('security_level', 'high'),
                     client_ip=self.get_client_ip(request),
+                    selection_mode=serializer.validated_data.get('selection_mode'),
                     config={
                         'enable_kill_switch': serializer.validated_data.get('enable_kill_switch', True),
                         'enable_dns_protection': serializer.validated_data.get('enable_dns_protection', True),
                     }
                 )
+                # The tunnel comes up in the background; clients poll the
+                # session or watch ws/sessions/<id>/ for status changes
+                establish_session_async(session)
                 session_serializer = UserSessionSerializer(session)
-                return Response(session_serializer.data, status=status.HTTP_201_CREATED)
+                return Response(session_serializer.data, status=status.HTTP_202_ACCEPTED)
             except Exception as e:
                 return Response(
                     {'error': str(e)}, 
@@ -136,7 +281,7 @@ class UserSessionViewSet(viewsets.ModelViewSet):
     def disconnect(self, request, pk=None):
         try:
             session = self.get_object()
-            proxy_manager = ProxyManager()
+            proxy_manager = get_proxy_manager()
             proxy_manager.end_session(session)
             return Response({'status': 'disconnected'})
         except Exception as e:
@@ -147,22 +292,31 @@ class UserSessionViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def active(self, request):
-        active_session = UserSession.objects.filter(
-            user=request.user, 
-            is_active=True
-        ).first()
+        active_session = self.get_queryset().filter(is_active=True).first()
         if active_session:
             serializer = self.get_serializer(active_session)
             return Response(serializer.data)
         return Response({'detail': 'No active session'}, status=status.HTTP_404_NOT_FOUND)
 
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
+
+class ConnectionLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """The user's own connection events, newest first; ?session=<id> narrows to one session"""
+    serializer_class = ConnectionLogSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ConnectionLogCursorPagination
+
+    def get_queryset(self):
+        # user is denormalized onto the log, so this is an index range scan
+        queryset = ConnectionLog.objects.filter(user=self.request.user)
+        session_id = self.request.query_params.get('session')
+        if session_id:
+            try:
+                queryset = queryset.filter(session_id=uuid.UUID(session_id))
+            except ValueError:
+                return queryset.none()
+        return queryset.order_by('-timestamp', '-id')
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserSerializer
@@ -171,20 +325,47 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return User.objects.filter(id=self.request.user.id)
 
+    @staticmethod
+    def _data_used(user):
+        # The usage collector updates it with F() from another process, so
+        # the cached request.user can be up to USER_CACHE_TTL behind
+        return User.objects.filter(id=user.id).values_list('data_used', flat=True).first() or 0
+
     @action(detail=False, methods=['get'])
     def profile(self, request):
-        serializer = self.get_serializer(request.user)
+        user = request.user
+        user.data_used = self._data_used(user)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
         total_sessions = UserSession.objects.filter(user=request.user).count()
         active_session = UserSession.objects.filter(user=request.user, is_active=True).exists()
-        total_data = request.user.data_used
+        total_data = self._data_used(request.user)
+
+        # Recent activity comes from the hourly rollups, not raw logs
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+        except ValueError:
+            days = 30
+        usage = UsageRollup.objects.filter(
+            user=request.user,
+            hour__gte=timezone.now() - timedelta(days=days)
+        ).aggregate(
+            connects=Sum('connect_count'),
+            errors=Sum('error_count'),
+            data_used=Sum('bytes_used'),
+            session_seconds=Sum('session_seconds'),
+        )
         
         return Response({
             'total_sessions': total_sessions,
             'is_connected': active_session,
             'total_data_used': total_data,
-            'subscription_tier': request.user.subscription_tier
+            'subscription_tier': request.user.subscription_tier,
+            'recent_usage': {
+                'days': days,
+                **{key: value or 0 for key, value in usage.items()},
+            }
         })
\ No newline at end of file
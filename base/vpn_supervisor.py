@@ -0,0 +1,266 @@
+import grp
+import ipaddress
+import json
+import os
+import re
+import socket
+import socketserver
+import stat
+import threading
+import uuid
+from django.conf import settings
+from .real_vpn_manager import RealVPNManager
+
+# Inside a private directory, never a world-writable one like /tmp
+DEFAULT_SOCKET = '/run/anonimity-vpn/supervisor.sock'
+
+# Tunnel bring-up waits up to 30s inside the supervisor (laptop OpenVPN)
+START_TIMEOUT = 45
+CALL_TIMEOUT = 5
+
+
+def get_vpn_manager():
+    """
+    The VPN backend for this process: a client of the host supervisor when
+    VPN_SUPERVISOR_SOCKET is set, otherwise an in-process RealVPNManager.
+    """
+    socket_path = getattr(settings, 'VPN_SUPERVISOR_SOCKET', None)
+    if socket_path:
+        return VPNSupervisorClient(socket_path)
+    return RealVPNManager()
+
+
+class SupervisorError(Exception):
+    pass
+
+
+# The supervisor runs as root: every request field that reaches a path or
+# a command line is checked, and configs may not carry anything that runs
+# commands or writes files
+INTERFACE_PATTERN = re.compile(r'[a-z0-9]{1,15}')
+WIREGUARD_HOOKS = {'preup', 'postup', 'predown', 'postdown'}
+OPENVPN_FORBIDDEN = {
+    'up', 'down', 'script-security', 'plugin', 'route-up', 'route-pre-down',
+    'ipchange', 'tls-verify', 'learn-address', 'config', 'log', 'log-append',
+    'status', 'writepid',
+}
+
+
+def check_key(key):
+    """Keys are user ids; only the canonical UUID form is accepted"""
+    try:
+        valid = isinstance(key, str) and str(uuid.UUID(key)) == key
+    except ValueError:
+        valid = False
+    if not valid:
+        raise SupervisorError("Invalid key")
+    return key
+
+
+def check_interface(interface):
+    if not isinstance(interface, str) or not INTERFACE_PATTERN.fullmatch(interface):
+        raise SupervisorError("Invalid interface name")
+    return interface
+
+
+def check_config(vpn_type, config):
+    """Reject wg-quick hooks and OpenVPN script, plugin and file directives"""
+    if not isinstance(config, str):
+        raise SupervisorError("Invalid config")
+    inline_block = None
+    for line in config.splitlines():
+        line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+        if vpn_type == 'wireguard':
+            directive = line.split('=', 1)[0].strip().lower()
+            if directive in WIREGUARD_HOOKS:
+                raise SupervisorError(f"Config directive not allowed: {directive}")
+        else:
+            # Certificates and keys sit in <ca>...</ca> style blocks
+            if inline_block:
+                if line.lower() == f'</{inline_block}>':
+                    inline_block = None
+                continue
+            if line.startswith('<') and line.endswith('>'):
+                inline_block = line[1:-1].lower()
+                continue
+            directive = line.split(None, 1)[0].lower().lstrip('-')
+            if directive in OPENVPN_FORBIDDEN:
+                raise SupervisorError(f"Config directive not allowed: {directive}")
+    return config
+
+
+def prepare_socket_directory(directory, group=None):
+    """
+    Create the supervisor's runtime directory (0700, or 0750 for group), or
+    check that an existing one is ours and closed to everyone else.
+    """
+    os.makedirs(os.path.dirname(directory) or '.', exist_ok=True)
+    try:
+        os.mkdir(directory, 0o700)
+        created = True
+    except FileExistsError:
+        created = False
+    if created:
+        if group:
+            os.chown(directory, -1, grp.getgrnam(group).gr_gid)
+            os.chmod(directory, 0o750)
+        return
+
+    info = os.lstat(directory)
+    closed = 0o027 if group else 0o077
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid() or info.st_mode & closed:
+        raise SupervisorError(
+            f"{directory} must be a directory owned by this user and closed to others "
+            f"(mode {'0750' if group else '0700'})"
+        )
+
+
+class VPNSupervisorClient:
+    """
+    Drop-in for RealVPNManager used by Django workers. Configs are rendered
+    here (they need the database); the supervisor only runs processes.
+
+    Protocol: one JSON object per line each way over a Unix socket,
+    {"op": ..., ...} -> {"ok": true, "result": ...} or {"ok": false, "error": ...}
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.renderer = RealVPNManager()
+
+    def start_wireguard_connection(self, server, user):
+        return self._call(
+            'start',
+            timeout=START_TIMEOUT,
+            key=str(user.id),
+            vpn_type='wireguard',
+            config=self.renderer.create_wireguard_config(server, user),
+            interface=self.renderer.wireguard_interface(user),
+            server_ip=server.ip_address,
+        )
+
+    def start_openvpn_connection(self, server, user):
+        return self._call(
+            'start',
+            timeout=START_TIMEOUT,
+            key=str(user.id),
+            vpn_type='openvpn',
+            config=self.renderer.create_openvpn_config(server, user),
+            interface=self.renderer.openvpn_interface(user),
+            server_ip=server.ip_address,
+        )
+
+    def stop_connection(self, user_id):
+        return self._call('stop', key=str(user_id))
+
+    def get_connection_status(self, user_id):
+        return self._call('status', key=str(user_id))
+
+    def list_connections(self):
+        return self._call('list')
+
+    def _call(self, op, timeout=CALL_TIMEOUT, **params):
+        request = json.dumps({'op': op, **params}, separators=(',', ':')).encode() + b'\n'
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(request)
+                with sock.makefile('rb') as stream:
+                    line = stream.readline()
+        except OSError as e:
+            raise SupervisorError(f"VPN supervisor unavailable: {e}")
+
+        if not line:
+            raise SupervisorError("VPN supervisor closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise SupervisorError(response.get('error', 'Unknown supervisor error'))
+        return response.get('result')
+
+
+class SupervisorRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = {'ok': True, 'result': self.server.dispatch(json.loads(line))}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+            self.wfile.flush()
+
+
+class VPNSupervisor(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Owns every wg/openvpn child on this host for as long as it runs"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, manager=None, group=None):
+        self.manager = manager or RealVPNManager()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        group = group or getattr(settings, 'VPN_SUPERVISOR_GROUP', None)
+
+        prepare_socket_directory(os.path.dirname(os.path.abspath(socket_path)), group)
+        # A socket left behind by a previous run would make bind() fail
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        # bind() creates the socket with the umask applied: never wider than 0600/0660
+        previous_umask = os.umask(0o117 if group else 0o177)
+        try:
+            super().__init__(socket_path, SupervisorRequestHandler)
+        finally:
+            os.umask(previous_umask)
+        if group:
+            os.chown(socket_path, -1, grp.getgrnam(group).gr_gid)
+
+    def dispatch(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            return 'pong'
+        if op == 'list':
+            return sorted(self.manager.vpn_processes)
+
+        key = check_key(request.get('key'))
+
+        # Start/stop for the same user must not interleave
+        with self._lock_for(key):
+            if op == 'start':
+                return self._start(key, request)
+            if op == 'stop':
+                return bool(self.manager.stop_connection(key))
+            if op == 'status':
+                return self.manager.get_connection_status(key)
+        raise SupervisorError(f"Unknown op: {op}")
+
+    def stop_all(self):
+        for key in list(self.manager.vpn_processes):
+            self.manager.stop_connection(key)
+
+    def server_close(self):
+        path = self.server_address
+        super().server_close()
+        if isinstance(path, str) and os.path.exists(path):
+            os.unlink(path)
+
+    def _start(self, key, request):
+        vpn_type = request.get('vpn_type')
+        if vpn_type not in ('wireguard', 'openvpn'):
+            raise SupervisorError(f"Unsupported VPN type: {vpn_type}")
+        interface = check_interface(request.get('interface'))
+        config = check_config(vpn_type, request.get('config'))
+        try:
+            server_ip = str(ipaddress.ip_address(request.get('server_ip')))
+        except ValueError:
+            raise SupervisorError("Invalid server_ip")
+
+        self.manager.stop_connection(key)
+        if vpn_type == 'wireguard':
+            return self.manager.launch_wireguard(key, config, interface, server_ip)
+        return self.manager.launch_openvpn(key, config, interface, server_ip)
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
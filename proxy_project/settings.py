@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import dj_database_url
 from pathlib import Path
 from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
@@ -22,6 +24,35 @@ VPN_CONFIG_DIR = '/tmp/vpn_configs'
 WIREGUARD_PATH = '/usr/bin/wg'
 OPENVPN_PATH = '/usr/sbin/openvpn'
 
+# Unix socket of the host VPN supervisor (manage.py run_vpn_supervisor).
+# Unset: each worker runs VPN processes itself. The socket's directory is
+# private to the supervisor's user (0700); set VPN_SUPERVISOR_GROUP to let
+# workers running as another user in that group connect (0750/0660).
+VPN_SUPERVISOR_SOCKET = os.environ.get('VPN_SUPERVISOR_SOCKET')
+VPN_SUPERVISOR_GROUP = os.environ.get('VPN_SUPERVISOR_GROUP')
+
+# Server assignment: 'least_loaded', 'two_choices' or 'weighted'
+PROXY_SELECTION_MODE = 'least_loaded'
+PROXY_SELECTION_CANDIDATES = 8
+
+# "Automatic (nearest)" resolves clients with a local MaxMind-format database
+GEOIP_DATABASE = BASE_DIR / 'geoip' / 'GeoLite2-City.mmdb'
+GEOIP_CACHE_SIZE = 4096
+GEO_NEAREST_CANDIDATES = 5
+
+# Rendered catalog responses kept per process (one per version and URL)
+CATALOG_SNAPSHOT_CACHE_SIZE = 64
+# Snapshots are rebuilt when a server's load crosses a multiple of this,
+# not on every connect/disconnect
+CATALOG_LOAD_STEP = 0.05
+# How often each process re-reads the shared catalog version and the
+# servers' load columns, i.e. the longest a server change or the
+# connects made elsewhere can go unseen (seconds)
+CATALOG_VERSION_CHECK_INTERVAL = 1.0
+
+# Shared CA certificates / DH params kept decoded per process
+BLOB_CACHE_SIZE = 64
+
 # Encryption for storing keys
 
 
@@ -49,6 +80,7 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -70,9 +102,22 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'base.middleware.DebugMiddleware',  # Add this for debugging
+    'base.middleware.TimingMiddleware',
+    'base.middleware.QueryCountMiddleware',
 ]
 
+# Count queries per request and report repeated SQL (N+1); off in production
+QUERY_INSPECTION = os.environ.get('QUERY_INSPECTION', 'False') == 'True'
+QUERY_REPEAT_THRESHOLD = 5
+
+# Per-route latency histograms are served at /metrics to these networks.
+# Remote scrapers send "Authorization: Bearer <METRICS_TOKEN>" instead;
+# behind a proxy REMOTE_ADDR is the proxy's, so keep this to loopback
+METRICS_ALLOWED_NETWORKS = ['127.0.0.0/8', '::1/128']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Fraction of requests dumped to stdout (headers and body, secrets redacted)
+REQUEST_DUMP_SAMPLE_RATE = 0.0
+
 ROOT_URLCONF = 'proxy_project.urls'
 
 TEMPLATES = [
@@ -91,6 +136,15 @@ TEMPLATES = [
     },
 ]
 
+# Password hashing for login/register runs on this many dedicated threads;
+# further requests queue up to the limit, then get 503 + Retry-After
+AUTH_HASH_WORKERS = 4
+AUTH_HASH_QUEUE_LIMIT = 256
+
+# Authenticated users are cached per process without their key material
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60  # seconds
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'base.authentication.JWTAuthentication',  # Use our custom JWT auth    
@@ -99,6 +153,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed; fall back to DRF's stdlib json when orjson is missing
+    'DEFAULT_RENDERER_CLASSES': [
+        'base.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'base.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
@@ -117,17 +181,70 @@ CORS_ALLOW_ALL_ORIGINS = True  # Only for development!
 CORS_ALLOW_CREDENTIALS = True
 
 WSGI_APPLICATION = 'proxy_project.wsgi.application'
+ASGI_APPLICATION = 'proxy_project.asgi.application'
+
+# Session status push. The in-memory layer only reaches clients connected
+# to the same process; use channels_redis when running several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Background threads that bring tunnels up for new sessions
+SESSION_SETUP_WORKERS = 8
+
+# ConnectionLog rows are buffered and bulk-inserted per worker
+CONNECTION_LOG_BATCH_SIZE = 200
+CONNECTION_LOG_FLUSH_INTERVAL = 2.0  # seconds
+
+# Seconds between tunnel traffic readings (manage.py collect_data_usage)
+USAGE_COLLECT_INTERVAL = 30
+
+# Raw ConnectionLog rows are compacted into hourly UsageRollup rows
+# (manage.py rollup_usage) and deleted after this many days
+CONNECTION_LOG_RETENTION_DAYS = 30
+USAGE_ROLLUP_LAG_SECONDS = 300
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DATABASE_URL (provisioned by render.yaml) selects Postgres; without it
+# the local SQLite file is used.
+#
+# Connections are closed after every request unless a WSGI deployment
+# (gunicorn) opts in with DB_PERSISTENT_CONNECTIONS=True; DB_CONN_MAX_AGE
+# then sets their lifetime in seconds. Never opt in under daphne (the
+# Dockerfile's server): ASGI runs sync code on a pool of executor
+# threads, each holding its own connection, so persistent connections
+# pile up until Postgres runs out of max_connections.
+#
+# Pooling is PgBouncer's job (Django 4.2 has no built-in pool): run it
+# with pool_mode = transaction next to the app, point DATABASE_URL at it
+# and set DB_PGBOUNCER=True. Opening a connection per request is then a
+# cheap local handshake with PgBouncer rather than a new Postgres backend.
+DB_PERSISTENT_CONNECTIONS = os.environ.get('DB_PERSISTENT_CONNECTIONS', 'False') == 'True'
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': dj_database_url.config(
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)) if DB_PERSISTENT_CONNECTIONS else 0,
+        conn_health_checks=True,
+    )
 }
+# Transaction pooling hands each transaction a different server
+# connection, which server-side cursors cannot survive
+if os.environ.get('DB_PGBOUNCER', 'False') == 'True':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Threaded tests need a file: the in-memory test database fails
+    # concurrent writers with "table is locked" instead of waiting
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+# SQLite only (edge nodes): WAL, synchronous=NORMAL, bigger page cache,
+# mmap and busy_timeout on every new connection; see base/sqlite_tuning.py.
+# SQLITE_PRAGMAS overrides the defaults there.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True') == 'True'
 VPN_CONFIG_DIR = '/tmp/vpn_configs'
 
 # Password validation